@@ -7,11 +7,12 @@ from core.models import (
     SubscriptionPlan, SubscriptionPlanInfo, UserUpdate, UserPasswordUpdate
 )
 from core.auth import (
-    get_password_hash, authenticate_user, create_access_token,
-    get_current_active_user, get_user_by_email, verify_password
+    authenticate_user, create_access_token,
+    get_current_active_user, get_user_by_email, async_verify_password,
+    async_get_password_hash, invalidate_user
 )
 from core.config import settings
-from core.database import user_db
+from core.database import async_user_db
 
 router = APIRouter()
 
@@ -53,7 +54,7 @@ async def register_user(user_data: UserCreate):
         )
     
     # Hash password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await async_get_password_hash(user_data.password)
     
     # Create user document
     user_doc = {
@@ -67,8 +68,8 @@ async def register_user(user_data: UserCreate):
     }
     
     # Insert into user database
-    users_collection = user_db["users"]
-    result = users_collection.insert_one(user_doc)
+    users_collection = async_user_db["users"]
+    result = await users_collection.insert_one(user_doc)
     
     if result.inserted_id:
         return {
@@ -93,8 +94,8 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
         )
     
     # Get user's subscription info (don't block login if expired/cancelled)
-    subscriptions_collection = user_db["subscriptions"]
-    subscription_doc = subscriptions_collection.find_one({
+    subscriptions_collection = async_user_db["subscriptions"]
+    subscription_doc = await subscriptions_collection.find_one({
         "user_id": user.id
     }, sort=[("created_at", -1)])  # Get most recent subscription
     
@@ -147,10 +148,10 @@ async def update_user_name(
 ):
     """Update user's name"""
     try:
-        users_collection = user_db["users"]
+        users_collection = async_user_db["users"]
         
         # Update user name
-        result = users_collection.update_one(
+        result = await users_collection.update_one(
             {"_id": ObjectId(current_user.id)},
             {
                 "$set": {
@@ -165,6 +166,7 @@ async def update_user_name(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Failed to update name"
             )
+        invalidate_user(current_user.email)
         
         return {
             "message": "Name updated successfully",
@@ -184,10 +186,10 @@ async def update_user_password(
 ):
     """Update user's password"""
     try:
-        users_collection = user_db["users"]
+        users_collection = async_user_db["users"]
         
         # Get current user with password hash
-        user_doc = users_collection.find_one({"_id": ObjectId(current_user.id)})
+        user_doc = await users_collection.find_one({"_id": ObjectId(current_user.id)})
         if not user_doc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -195,17 +197,17 @@ async def update_user_password(
             )
         
         # Verify current password
-        if not verify_password(password_update.current_password, user_doc["hashed_password"]):
+        if not await async_verify_password(password_update.current_password, user_doc["hashed_password"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Current password is incorrect"
             )
         
         # Hash new password
-        new_hashed_password = get_password_hash(password_update.new_password)
+        new_hashed_password = await async_get_password_hash(password_update.new_password)
         
         # Update password
-        result = users_collection.update_one(
+        result = await users_collection.update_one(
             {"_id": ObjectId(current_user.id)},
             {
                 "$set": {
@@ -220,6 +222,7 @@ async def update_user_password(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Failed to update password"
             )
+        invalidate_user(current_user.email)
         
         return {
             "message": "Password updated successfully"
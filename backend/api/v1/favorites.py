@@ -1,11 +1,16 @@
-import uuid
 import datetime
-import bson
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from core.database import listings_db as db, user_db
+from core.database import user_db
+from core.registry import source_registry
+from core.listing_ids import parse_listing_id, format_listing_id
+from core.listing_lookup import MAX_BATCH_IDS, find_listings_by_ids, unknown_fields
+from core.responses import ListingJSONResponse
 from core.config import settings
-from core.models import User, Favorite, DeleteFavorite, GetFavorites, CreateFavoriteRequest
+from core.models import (
+    User, Favorite, DeleteFavorite, GetFavorites, GetFavoritesWithListings, CreateFavoriteRequest
+)
 from core.auth import get_current_subscribed_user
 
 router = APIRouter()
@@ -16,19 +21,14 @@ def create_favorite(
     current_user: User = Depends(get_current_subscribed_user),  # Require authenticated user with subscription
 ):
     """Create a favorite"""    
-    # Clean the string - remove any whitespace or quotes
-    listing_id = request.listing_id.strip().strip('"').strip("'")
-    
-    uuid_value = uuid.UUID(listing_id)
-
-    # Make sure the listing actually exists
-    exists = False
-    collection_names = list(db.list_collection_names())
-    for collection_name in collection_names:
-        exists = db[collection_name].find_one({"_id": bson.Binary.from_uuid(uuid_value)})
-        if exists:
-            break
+    try:
+        listing_key = parse_listing_id(request.listing_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid listing ID format")
+    listing_id = format_listing_id(listing_key)
 
+    # Make sure the listing actually exists (an _id-only point lookup served by the index)
+    exists = source_registry.collection.find_one({"_id": listing_key}, {"_id": 1})
     if not exists:
         raise HTTPException(status_code=404, detail="Listing not found")
     
@@ -60,4 +60,32 @@ def get_favorites(
     """Get all favorites"""
     favorites = user_db["favorites"].find({"user_id": current_user.id})
     favorites_list = [x["listing_id"] for x in favorites]
-    return {"favorites": favorites_list}
\ No newline at end of file
+    return {"favorites": favorites_list}
+
+
+@router.get("/favorites/listings", response_model=GetFavoritesWithListings)
+def get_favorites_with_listings(
+    current_user: User = Depends(get_current_subscribed_user),
+    fields: Optional[List[str]] = Query(None),
+    limit: int = Query(MAX_BATCH_IDS, ge=1, le=MAX_BATCH_IDS, description="Most recent favorites to return"),
+):
+    """Get the most recent favorites together with their listings, resolved in one query"""
+    unknown = unknown_fields(fields or [])
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    favorites = list(user_db["favorites"].find({"user_id": current_user.id}).sort("created_at", -1).limit(limit))
+    listings = find_listings_by_ids([x["listing_id"] for x in favorites], fields)
+
+    results = []
+    for favorite in favorites:
+        try:
+            listing = listings.get(format_listing_id(parse_listing_id(favorite["listing_id"])))
+        except ValueError:
+            listing = None
+        results.append({
+            "listing_id": favorite["listing_id"],
+            "created_at": favorite["created_at"],
+            "listing": listing,
+        })
+    return ListingJSONResponse({"favorites": results})
@@ -1,18 +1,176 @@
 import math
+import base64
 import datetime
-import uuid
-import bson
-from fastapi import APIRouter, Query, Depends, HTTPException
-from typing import Optional
-from core.database import listings_db as db
+from bson import json_util
+from fastapi import APIRouter, Query, Depends, HTTPException, Request
+from typing import List, Optional
+from core.registry import SourceInfo, source_registry
+from core.locations import LocationSuggestion, location_index
+from core.listing_ids import parse_listing_id, format_listing_id
+from core.listing_lookup import LISTING_PROJECTION, MAX_BATCH_IDS, find_listings_by_ids, unknown_fields
 from core.config import settings
-from core.models import User
+from core.cache import TTLCache, ResultCache, cache_backend
+from core.data_version import get_data_version
+from core.models import User, BatchListingsRequest
 from core.auth import get_current_subscribed_user
+from core.responses import ListingJSONResponse
+from core.database import listing_cards_collection
+from core.http_cache import make_etag, etag_matches, not_modified, conditional_response
 
-router = APIRouter()
+router = APIRouter(default_response_class=ListingJSONResponse)
 
-def get_all_listings_filtered(
+# total_count per normalized filter combination and data version
+count_cache = TTLCache(ttl=settings.LISTINGS_COUNT_CACHE_SECONDS)
+
+# Whole listing pages, keyed by every query parameter and the data version
+listings_cache = ResultCache(cache_backend, namespace="listings")
+
+# Facet counts per filter set and data version
+facets_cache = ResultCache(cache_backend, namespace="facets")
+
+# Text search ranks matches by relevance and only considers the best ones, so a
+# broad term can't make a query sort and count most of the collection
+MAX_TEXT_MATCHES = 1000
+
+# Sale Price (USD) bucket lower bounds for the price facet; the last one is open-ended
+PRICE_BUCKET_BOUNDARIES = [0, 10000, 25000, 50000, 100000, 200000, 500000]
+
+# $centerSphere takes its radius in radians
+EARTH_RADIUS_KM = 6378.1
+MAX_NEAR_RADIUS_KM = 200
+
+# Filter every listings query applies, even when the user picked no filters
+BASE_QUERY = {"Sale Price": {"$exists": True, "$type": "number"}}
+
+# Compact projection for grid views: the first image and the fields shown on a card.
+# Everything else comes from the detail endpoint. These are exactly the fields stored
+# in listing_cards, so card pages never touch the full listing documents.
+CARD_PROJECTION = {
+    "_id": 1,
+    "source": 1,
+    "Prefecture": 1,
+    "Building - Layout": 1,
+    "municipality": 1,
+    "location": 1,
+    "geo_precision": 1,
+    "Sale Price": 1,
+    "createdAt": 1,
+    "images": 1,
+    "building_area_sqm": 1,
+    "land_area_sqm": 1,
+    "construction_year": 1
+}
+
+LISTING_VIEWS = {
+    "full": LISTING_PROJECTION,
+    "card": CARD_PROJECTION,
+}
+
+
+def build_listing_projection(view, fields, sort_field):
+    """
+    Projection for a list request. Explicit fields take precedence over the view;
+    _id and the sort field are always included because next_cursor is built from them.
+    """
+    if not fields:
+        return LISTING_VIEWS[view]
+    projection = {"_id": 1}
+    for field in fields:
+        projection[field] = LISTING_PROJECTION[field]
+    projection[sort_field] = 1
+    return projection
+
+
+def load_full_listings(page, projection):
+    """Replace a page of listing cards with the full listing documents, in page order"""
+    if not page:
+        return page
+    listings = source_registry.collection.find({"_id": {"$in": [card["_id"] for card in page]}}, projection)
+    by_id = {listing["_id"]: listing for listing in listings}
+    return [by_id[card["_id"]] for card in page if card["_id"] in by_id]
+
+
+def add_range_filter(query, field, minimum, maximum):
+    """Add a $gte/$lte range on a stored numeric field to the query"""
+    if minimum is None and maximum is None:
+        return
+    condition = query.setdefault(field, {})
+    if minimum is not None:
+        condition["$gte"] = minimum
+    if maximum is not None:
+        condition["$lte"] = maximum
+
+
+def parse_near(near, radius_km):
+    """Parse "lat,lon" into a $geoWithin circle on the location field"""
+    try:
+        latitude, longitude = (float(part) for part in near.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="near must be latitude,longitude")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise HTTPException(status_code=400, detail="near is out of range")
+    return {"$geoWithin": {"$centerSphere": [[longitude, latitude], radius_km / EARTH_RADIUS_KM]}}
+
+
+def parse_bbox(bbox):
+    """
+    Parse "min_lon,min_lat,max_lon,max_lat" (the GeoJSON bbox order) into a
+    $geoWithin polygon on the location field. A polygon rather than $box, because
+    $box is planar and isn't served by the 2dsphere index.
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise HTTPException(status_code=400, detail="bbox is out of range or empty")
+    ring = [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+    return {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}
+
+
+def encode_cursor(sort_field, sort_direction, last_result):
+    """Encode the position after last_result as an opaque cursor string"""
+    payload = {
+        "s": sort_field,
+        "d": sort_direction,
+        "v": last_result[sort_field],
+        "id": last_result["_id"],
+    }
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort_field, sort_direction):
+    """Decode a cursor into (sort value, _id). Raises ValueError if it is invalid for this sort."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        value, last_id = payload["v"], payload["id"]
+    except Exception:
+        raise ValueError("Malformed cursor")
+
+    if payload.get("s") != sort_field or payload.get("d") != sort_direction:
+        raise ValueError("Cursor was issued for a different sort order")
+    return value, last_id
+
+
+def cursor_predicate(sort_field, sort_direction, value, last_id):
+    """Match the documents that come after (value, last_id) in the sort order"""
+    after = "$gt" if sort_direction == 1 else "$lt"
+    bound = "$gte" if sort_direction == 1 else "$lte"
+    return {"$and": [
+        # The plain range on the sort key gives the index scan a tight starting bound
+        {sort_field: {bound: value}},
+        {"$or": [
+            {sort_field: {after: value}},
+            {sort_field: value, "_id": {after: last_id}},
+        ]},
+    ]}
+
+
+def build_listings_query(
+    source: Optional[str] = None,
     prefecture: Optional[str] = None,
+    municipality: Optional[str] = None,
     layout: Optional[str] = None,
     sale_price_min: Optional[int] = None,
     sale_price_max: Optional[int] = None,
@@ -22,451 +180,202 @@ def get_all_listings_filtered(
     land_area_max: Optional[int] = None,
     construction_year_min: Optional[int] = None,
     construction_year_max: Optional[int] = None,
-    sort_by: Optional[str] = "createdAt",
-    sort_order: Optional[str] = "desc",
-    page: int = 1,
-    limit: int = 20,
+    location: Optional[dict] = None,
+    include_approximate: bool = False,
 ):
+    """Mongo filter for the listing filter parameters shared by /listings and /listings/facets"""
     query = {}
 
+    if source:
+        query["source"] = source
     if prefecture:
         query["Prefecture"] = prefecture
+    if municipality:
+        query["municipality"] = municipality
     if layout:
         query["Building - Layout"] = layout
     
     # Add price filtering to query - only include listings with numeric sale prices
-    query["Sale Price"] = {"$exists": True, "$type": "number"}
-    
-    if sale_price_min is not None or sale_price_max is not None:
-        if "Sale Price" not in query:
-            query["Sale Price"] = {}
-        if sale_price_min is not None:
-            query["Sale Price"]["$gte"] = sale_price_min
-        if sale_price_max is not None:
-            query["Sale Price"]["$lte"] = sale_price_max
-
-    # Map API parameter to database field name
+    query["Sale Price"] = dict(BASE_QUERY["Sale Price"])
+    add_range_filter(query, "Sale Price", sale_price_min, sale_price_max)
+
+    # Area and construction year are typed fields computed by the crawlers at insert
+    # time, so they can be filtered in the initial $match and served by an index
+    add_range_filter(query, "building_area_sqm", building_area_min, building_area_max)
+    add_range_filter(query, "land_area_sqm", land_area_min, land_area_max)
+    add_range_filter(query, "construction_year", construction_year_min, construction_year_max)
+
+    # Geocoded by the crawlers at insert time. Listings whose municipality wasn't in
+    # the gazetteer sit at their prefecture's point, which would put them in or out
+    # of a radius or viewport wholesale, so they are left out unless asked for
+    if location:
+        query["location"] = location
+        if not include_approximate:
+            query["geo_precision"] = "municipality"
+    return query
+
+
+def search_listings(query, q, sort_field, sort_direction, page, limit, projection):
+    """
+    Full-text search over the listings' text index combined with the other filters.
+
+    Matches are ranked by text score and capped at MAX_TEXT_MATCHES before any other
+    sorting or counting. Runs on the full listings collection, where the text lives.
+    """
+    if projection is CARD_PROJECTION:
+        # Full documents carry every image; cards only show the first
+        projection = {**projection, "images": {"$slice": ["$images", 1]}}
+
+    pipeline = [
+        {"$match": {"$text": {"$search": q}, **query}},
+        {"$set": {"score": {"$meta": "textScore"}}},
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$limit": MAX_TEXT_MATCHES},
+    ]
+    if sort_field:
+        pipeline.append({"$sort": {sort_field: sort_direction, "_id": sort_direction}})
+    pipeline.append({"$facet": {
+        "results": [
+            {"$skip": (page - 1) * limit},
+            {"$limit": limit},
+            {"$project": {**projection, "score": 1}},
+        ],
+        "total": [{"$count": "total"}]
+    }})
+
+    facet = next(source_registry.collection.aggregate(pipeline))
+    results = facet["results"]
+    for listing in results:
+        listing["_id"] = format_listing_id(listing["_id"])
+    total_count = facet["total"][0]["total"] if facet["total"] else 0
+
+    return {
+        "results": results,
+        "total_count": total_count,
+        "total_pages": math.ceil(total_count / limit),
+        "current_page": page,
+        "next_cursor": None,
+        # Only the best MAX_TEXT_MATCHES matches are counted
+        "total_is_estimate": total_count >= MAX_TEXT_MATCHES
+    }
+
+
+def get_all_listings_filtered(
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = "desc",
+    page: int = 1,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    estimate_total: bool = False,
+    view: str = "full",
+    fields: Optional[List[str]] = None,
+    q: Optional[str] = None,
+    **filters,
+):
+    query = build_listings_query(**filters)
+
+    # Map API parameter to database field name. Text searches default to relevance order.
+    if sort_by is None:
+        sort_by = "relevance" if q else "createdAt"
+    if sort_by == "relevance" and not q:
+        raise ValueError("Sorting by relevance requires a search query")
     if sort_by == "sale_price":
         sort_field = "Sale Price"
+    elif sort_by == "relevance":
+        sort_field = None
     else:
         sort_field = "createdAt"
     sort_direction = 1 if sort_order == "asc" else -1
 
-    # Use MongoDB aggregation with $unionWith to create a unified view across all collections
-    # This allows proper database-level sorting and pagination
-    
-    # Get the first collection as the base
-    collection_names = list(db.list_collection_names())
-    if not collection_names:
-        return {
-            "results": [],
-            "total_count": 0,
-            "total_pages": 0,
-            "current_page": page
-        }
-    
-    base_collection = db[collection_names[0]]
-    
-    # Build the aggregation pipeline
-    pipeline = [
-        # Match documents based on query filters
-        {"$match": query},
-        
-        # Project and add computed fields
-        {"$addFields": {
-            # Extract first number from "Building - Area" string
-            "building_area_numeric": {
-                "$let": {
-                    "vars": {
-                        "matches": {
-                            "$regexFind": {
-                                "input": {"$ifNull": ["$Building - Area", ""]},
-                                "regex": r"([0-9]+(?:\.[0-9]+)?)"
-                            }
-                        }
-                    },
-                    "in": {
-                        "$cond": {
-                            "if": {"$ne": ["$$matches", None]},
-                            "then": {"$toDouble": "$$matches.match"},
-                            "else": None
-                        }
-                    }
-                }
-            },
-            # Extract first number from "Land - Area" string
-            "land_area_numeric": {
-                "$let": {
-                    "vars": {
-                        "matches": {
-                            "$regexFind": {
-                                "input": {"$ifNull": ["$Land - Area", ""]},
-                                "regex": r"([0-9]+(?:\.[0-9]+)?)"
-                            }
-                        }
-                    },
-                    "in": {
-                        "$cond": {
-                            "if": {"$ne": ["$$matches", None]},
-                            "then": {"$toDouble": "$$matches.match"},
-                            "else": None
-                        }
-                    }
-                }
-            },
-            # Extract construction year from "Building - Construction Date" string
-            # Look for 4-digit number first, then "X years" format
-            "construction_year": {
-                "$let": {
-                    "vars": {
-                        "dateStr": {"$ifNull": ["$Building - Construction Date", ""]},
-                        "currentYear": {"$year": "$$NOW"}
-                    },
-                    "in": {
-                        "$cond": {
-                            "if": {"$eq": ["$$dateStr", ""]},
-                            "then": None,
-                            "else": {
-                                "$let": {
-                                    "vars": {
-                                        # Look for any 4-digit number
-                                        "fourDigitMatch": {
-                                            "$regexFind": {
-                                                "input": "$$dateStr",
-                                                "regex": r"(\d{4})"
-                                            }
-                                        }
-                                    },
-                                    "in": {
-                                        "$cond": {
-                                            "if": {"$ne": ["$$fourDigitMatch", None]},
-                                            "then": {"$toInt": "$$fourDigitMatch.match"},
-                                            "else": {
-                                                "$let": {
-                                                    "vars": {
-                                                        # Look for "X years" format
-                                                        "yearsMatch": {
-                                                            "$regexFind": {
-                                                                "input": "$$dateStr",
-                                                                "regex": r"(\d+)\s*years?"
-                                                            }
-                                                        }
-                                                    },
-                                                    "in": {
-                                                        "$cond": {
-                                                            "if": {"$ne": ["$$yearsMatch", None]},
-                                                            "then": {
-                                                                "$subtract": [
-                                                                    "$$currentYear",
-                                                                    {"$toInt": {"$arrayElemAt": ["$$yearsMatch.captures", 0]}}
-                                                                ]
-                                                            },
-                                                            "else": None
-                                                        }
-                                                    }
-                                                }
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }},
-        
-        # Filter by building area if specified
-        *([{
-            "$match": {
-                "building_area_numeric": {"$gte": building_area_min}
-            }
-        }] if building_area_min is not None else []),
-        
-        *([{
-            "$match": {
-                "building_area_numeric": {"$lte": building_area_max}
-            }
-        }] if building_area_max is not None else []),
-        
-                    # Filter by land area if specified
-            *([{
-                "$match": {
-                    "land_area_numeric": {"$gte": land_area_min}
-                }
-            }] if land_area_min is not None else []),
-            
-            *([{
-                "$match": {
-                    "land_area_numeric": {"$lte": land_area_max}
-                }
-            }] if land_area_max is not None else []),
-            
-            # Filter by construction year if specified (exclude nulls/invalid values)
-            *([{
-                "$match": {
-                    "construction_year": {
-                        "$gte": construction_year_min,
-                        "$ne": None,
-                        "$type": "number"
-                    }
-                }
-            }] if construction_year_min is not None else []),
-            
-            *([{
-                "$match": {
-                    "construction_year": {
-                        "$lte": construction_year_max,
-                        "$ne": None,
-                        "$type": "number"
-                    }
-                }
-            }] if construction_year_max is not None else []),
-
-        
-        # Project only the fields we need
-        {"$project": {
-            "_id": {"$toString": "$_id"},
-            "Prefecture": 1,
-            "Building - Layout": 1,
-            "Sale Price": 1,
-            "link": 1,
-            "Building - Area": 1,
-            "Land - Area": 1,
-            "Building - Construction Date": 1,
-            "Building - Structure": 1,
-            "Property Type": 1,
-            "Property Location": 1,
-            "Transportation": 1,
-            "createdAt": 1,
-            "images": 1,
-            "Contact Number": 1,
-            "Reference URL": 1,
-            "building_area_numeric": 1,  # Include for debugging if needed
-            "land_area_numeric": 1,  # Include for debugging if needed
-            "construction_year": 1  # Include for debugging if needed
-        }}
+    if q:
+        if cursor:
+            raise ValueError("Cursors are not supported with text search; use page")
+        projection = build_listing_projection(view, fields, sort_field or "_id")
+        return search_listings(query, q, sort_field, sort_direction, page, limit, projection)
+
+    # A cursor resumes right after the last listing of the previous page with a range
+    # predicate on the sort key, so deep pages cost the same as the first one
+    cursor_match = None
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_field, sort_direction)
+        cursor_match = cursor_predicate(sort_field, sort_direction, value, last_id)
+        position_stage = {"$match": cursor_match}
+    else:
+        position_stage = {"$skip": (page - 1) * limit}
+    # Pages are selected from the compact listing_cards collection. If the response
+    # needs fields a card doesn't carry, only the page's full documents are read.
+    projection = build_listing_projection(view, fields, sort_field)
+    # Cards carry only the first image, which is what view=card promises; an explicit
+    # images field asks for all of them
+    served_by_cards = set(projection) <= set(CARD_PROJECTION) and not (fields and "images" in fields)
+    page_stages = [
+        {"$limit": limit},
+        {"$project": projection if served_by_cards else {"_id": 1, sort_field: 1}}
     ]
-    
-    # Add $unionWith for all other collections
-    for coll_name in collection_names[1:]:
-        union_pipeline = [
+
+    # Counts are cached per filter combination. The estimate for the unfiltered view
+    # comes from collection metadata instead of counting every document.
+    count_key = (get_data_version(), json_util.dumps(query, sort_keys=True))
+    total_count = count_cache.get(count_key)
+    total_is_estimate = False
+    if total_count is None and estimate_total and query == BASE_QUERY:
+        total_count = listing_cards_collection.estimated_document_count()
+        total_is_estimate = True
+
+    # All sources live in one collection, so the match, sort and pagination run as a
+    # single pipeline. _id breaks ties so the sort order is stable across pages.
+    sort_stage = {"$sort": {sort_field: sort_direction, "_id": sort_direction}}
+    if cursor_match:
+        # Only the page is read, straight off the index. Counting would cost as much as
+        # the whole match set, so the total is only reported while it is cached; the
+        # first page of the sequence already returned it.
+        pipeline = [{"$match": {"$and": [query, cursor_match]}}, sort_stage, *page_stages]
+        all_results = list(listing_cards_collection.aggregate(pipeline))
+    elif total_count is not None:
+        # Only the page is needed, which the index can serve without reading past it
+        pipeline = [{"$match": query}, sort_stage, position_stage, *page_stages]
+        all_results = list(listing_cards_collection.aggregate(pipeline))
+    else:
+        # Compute the page and the total in one pass over the matching documents
+        pipeline = [
             {"$match": query},
-            
-            # Project and add computed fields
-            {"$addFields": {
-                # Extract first number from "Building - Area" string
-                "building_area_numeric": {
-                    "$let": {
-                        "vars": {
-                            "matches": {
-                                "$regexFind": {
-                                    "input": {"$ifNull": ["$Building - Area", ""]},
-                                    "regex": r"([0-9]+(?:\.[0-9]+)?)"
-                                }
-                            }
-                        },
-                        "in": {
-                            "$cond": {
-                                "if": {"$ne": ["$$matches", None]},
-                                "then": {"$toDouble": "$$matches.match"},
-                                "else": None
-                            }
-                        }
-                    }
-                },
-                # Extract first number from "Land - Area" string
-                "land_area_numeric": {
-                    "$let": {
-                        "vars": {
-                            "matches": {
-                                "$regexFind": {
-                                    "input": {"$ifNull": ["$Land - Area", ""]},
-                                    "regex": r"([0-9]+(?:\.[0-9]+)?)"
-                                }
-                            }
-                        },
-                        "in": {
-                            "$cond": {
-                                "if": {"$ne": ["$$matches", None]},
-                                "then": {"$toDouble": "$$matches.match"},
-                                "else": None
-                            }
-                        }
-                    }
-                },
-                # Extract construction year from "Building - Construction Date" string
-                # Look for 4-digit number first, then "X years" format
-                "construction_year": {
-                    "$let": {
-                        "vars": {
-                            "dateStr": {"$ifNull": ["$Building - Construction Date", ""]},
-                            "currentYear": {"$year": "$$NOW"}
-                        },
-                        "in": {
-                            "$cond": {
-                                "if": {"$eq": ["$$dateStr", ""]},
-                                "then": None,
-                                "else": {
-                                    "$let": {
-                                        "vars": {
-                                            # Look for any 4-digit number
-                                            "fourDigitMatch": {
-                                                "$regexFind": {
-                                                    "input": "$$dateStr",
-                                                    "regex": r"(\d{4})"
-                                                }
-                                            }
-                                        },
-                                        "in": {
-                                            "$cond": {
-                                                "if": {"$ne": ["$$fourDigitMatch", None]},
-                                                "then": {"$toInt": "$$fourDigitMatch.match"},
-                                                "else": {
-                                                    "$let": {
-                                                        "vars": {
-                                                            # Look for "X years" format
-                                                            "yearsMatch": {
-                                                                "$regexFind": {
-                                                                    "input": "$$dateStr",
-                                                                    "regex": r"(\d+)\s*years?"
-                                                                }
-                                                            }
-                                                        },
-                                                        "in": {
-                                                            "$cond": {
-                                                                "if": {"$ne": ["$$yearsMatch", None]},
-                                                                                                                                 "then": {
-                                                                     "$subtract": [
-                                                                         "$$currentYear",
-                                                                         {"$toInt": {"$arrayElemAt": ["$$yearsMatch.captures", 0]}}
-                                                                     ]
-                                                                 },
-                                                                "else": None
-                                                            }
-                                                        }
-                                                    }
-                                                }
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            }},
-            
-            # Filter by building area if specified
-            *([{
-                "$match": {
-                    "building_area_numeric": {"$gte": building_area_min}
-                }
-            }] if building_area_min is not None else []),
-            
-            *([{
-                "$match": {
-                    "building_area_numeric": {"$lte": building_area_max}
-                }
-            }] if building_area_max is not None else []),
-            
-            # Filter by land area if specified
-            *([{
-                "$match": {
-                    "land_area_numeric": {"$gte": land_area_min}
-                }
-            }] if land_area_min is not None else []),
-            
-            *([{
-                "$match": {
-                    "land_area_numeric": {"$lte": land_area_max}
-                }
-            }] if land_area_max is not None else []),
-            
-            # Filter by construction year if specified (exclude nulls/invalid values)
-            *([{
-                "$match": {
-                    "construction_year": {
-                        "$gte": construction_year_min,
-                        "$ne": None,
-                        "$type": "number"
-                    }
-                }
-            }] if construction_year_min is not None else []),
-            
-            *([{
-                "$match": {
-                    "construction_year": {
-                        "$lte": construction_year_max,
-                        "$ne": None,
-                        "$type": "number"
-                    }
-                }
-            }] if construction_year_max is not None else []),
-            
-            {"$project": {
-                "_id": {"$toString": "$_id"},
-                "Prefecture": 1,
-                "Building - Layout": 1,
-                "Sale Price": 1,
-                "link": 1,
-                "Building - Area": 1,
-                "Land - Area": 1,
-                "Building - Construction Date": 1,
-                "Building - Structure": 1,
-                "Property Type": 1,
-                "Property Location": 1,
-                "Transportation": 1,
-                "createdAt": 1,
-                "images": 1,
-                "Contact Number": 1,
-                "Reference URL": 1,
-                "building_area_numeric": 1,  # Include for debugging if needed
-                "land_area_numeric": 1,  # Include for debugging if needed
-                "construction_year": 1  # Include for debugging if needed
+            sort_stage,
+            {"$facet": {
+                "results": [position_stage, *page_stages],
+                "total": [{"$count": "total"}]
             }}
         ]
-        
-        pipeline.append({
-            "$unionWith": {
-                "coll": coll_name,
-                "pipeline": union_pipeline
-            }
-        })
-    
-    # Add sorting
-    pipeline.append({"$sort": {sort_field: sort_direction}})
-    
-    # Get total count first (without pagination)
-    count_pipeline = pipeline.copy()
-    count_pipeline.append({"$count": "total"})
-    
-    count_result = list(base_collection.aggregate(count_pipeline))
-    total_count = count_result[0]["total"] if count_result else 0
+        facet = next(listing_cards_collection.aggregate(pipeline))
+        all_results = facet["results"]
+        total_count = facet["total"][0]["total"] if facet["total"] else 0
+        count_cache.set(count_key, total_count)
     
-    # Add pagination
-    pipeline.extend([
-        {"$skip": (page - 1) * limit},
-        {"$limit": limit}
-    ])
-    
-    # Execute the aggregation
-    all_results = list(base_collection.aggregate(pipeline))
-    
-    total_pages = math.ceil(total_count / limit)
+    total_pages = math.ceil(total_count / limit) if total_count is not None else None
+
+    next_cursor = None
+    if len(all_results) == limit:
+        next_cursor = encode_cursor(sort_field, sort_direction, all_results[-1])
+
+    if not served_by_cards:
+        all_results = load_full_listings(all_results, projection)
+    for listing in all_results:
+        listing["_id"] = format_listing_id(listing["_id"])
 
     return {
         "results": all_results,
         "total_count": total_count,
         "total_pages": total_pages,
-        "current_page": page
+        # Cursor pages have no page number
+        "current_page": None if cursor else page,
+        "next_cursor": next_cursor,
+        "total_is_estimate": total_is_estimate
     }
 
 
-@router.get("/listings")
-def get_listings(
-    current_user: User = Depends(get_current_subscribed_user),  # Require authenticated user with subscription
+def listing_filters(
+    source: Optional[str] = Query(None),
     prefecture: Optional[str] = Query(None),
+    municipality: Optional[str] = Query(None, description="Exact municipality, e.g. from /listings/locations/autocomplete"),
     layout: Optional[str] = Query(None),
     sale_price_min: Optional[int] = Query(None),
     sale_price_max: Optional[int] = Query(None),
@@ -476,51 +385,256 @@ def get_listings(
     land_area_max: Optional[int] = Query(None),
     construction_year_min: Optional[int] = Query(None),
     construction_year_max: Optional[int] = Query(None),
-    sort_by: Optional[str] = Query("createdAt", regex="^(createdAt|sale_price)$"),
+    near: Optional[str] = Query(None, description="latitude,longitude; only listings within radius_km of it"),
+    radius_km: float = Query(10, gt=0, le=MAX_NEAR_RADIUS_KM),
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat; only listings inside it (map viewports)"),
+    include_approximate: bool = Query(False, description="With near/bbox, also match listings only located to their prefecture"),
+) -> dict:
+    """Filter query parameters shared by /listings and /listings/facets"""
+    if source and not source_registry.is_known(source):
+        raise HTTPException(status_code=400, detail=f"Unknown source: {source}")
+    if near and bbox:
+        raise HTTPException(status_code=400, detail="Use either near or bbox, not both")
+    location = None
+    if near:
+        location = parse_near(near, radius_km)
+    elif bbox:
+        location = parse_bbox(bbox)
+    return {
+        "source": source,
+        "prefecture": prefecture,
+        "municipality": municipality,
+        "layout": layout,
+        "sale_price_min": sale_price_min,
+        "sale_price_max": sale_price_max,
+        "building_area_min": building_area_min,
+        "building_area_max": building_area_max,
+        "land_area_min": land_area_min,
+        "land_area_max": land_area_max,
+        "construction_year_min": construction_year_min,
+        "construction_year_max": construction_year_max,
+        "location": location,
+        "include_approximate": include_approximate,
+    }
+
+
+def get_listing_facets(q=None, **filters):
+    """
+    Prefecture, layout and price-bucket counts for a filter set, in one aggregation.
+
+    Each facet is counted under every filter except its own, so selecting a
+    prefecture still shows how many listings the other prefectures have. With a
+    text search the counts run on the full listings collection and cover the best
+    MAX_TEXT_MATCHES matches for the shared filters, as /listings does.
+    """
+    query = build_listings_query(**filters)
+    own_filters = {
+        "prefecture": "Prefecture",
+        "layout": "Building - Layout",
+        "price": "Sale Price",
+    }
+
+    # Filters that apply to every facet go in the shared $match
+    common = {field: condition for field, condition in query.items() if field not in own_filters.values()}
+    common["Sale Price"] = dict(BASE_QUERY["Sale Price"])
+
+    def other_filters(facet):
+        return {
+            field: query[field]
+            for name, field in own_filters.items()
+            if name != facet and field in query
+        }
+
+    collection = listing_cards_collection
+    pipeline = [{"$match": common}]
+    if q:
+        collection = source_registry.collection
+        pipeline = [
+            {"$match": {"$text": {"$search": q}, **common}},
+            {"$set": {"score": {"$meta": "textScore"}}},
+            {"$sort": {"score": -1, "_id": 1}},
+            {"$limit": MAX_TEXT_MATCHES},
+        ]
+
+    pipeline += [
+        {"$facet": {
+            "prefecture": [
+                {"$match": other_filters("prefecture")},
+                {"$sortByCount": "$Prefecture"},
+            ],
+            "layout": [
+                {"$match": other_filters("layout")},
+                {"$sortByCount": "$Building - Layout"},
+            ],
+            "price": [
+                {"$match": other_filters("price")},
+                {"$bucket": {
+                    "groupBy": "$Sale Price",
+                    "boundaries": PRICE_BUCKET_BOUNDARIES,
+                    # Prices at or above the last boundary share the open-ended bucket
+                    "default": PRICE_BUCKET_BOUNDARIES[-1],
+                    "output": {"count": {"$sum": 1}},
+                }},
+            ],
+            "total": [
+                {"$match": other_filters(None)},
+                {"$count": "count"},
+            ],
+        }},
+    ]
+    facet = next(collection.aggregate(pipeline))
+
+    def values(rows):
+        return [{"value": row["_id"], "count": row["count"]} for row in rows if row["_id"] is not None]
+
+    upper_bounds = dict(zip(PRICE_BUCKET_BOUNDARIES, PRICE_BUCKET_BOUNDARIES[1:]))
+    return {
+        "prefecture": values(facet["prefecture"]),
+        "layout": values(facet["layout"]),
+        "price": [
+            {"min": row["_id"], "max": upper_bounds.get(row["_id"]), "count": row["count"]}
+            for row in facet["price"]
+        ],
+        "total_count": facet["total"][0]["count"] if facet["total"] else 0,
+    }
+
+
+@router.get("/listings")
+def get_listings(
+    request: Request,
+    current_user: User = Depends(get_current_subscribed_user),  # Require authenticated user with subscription
+    filters: dict = Depends(listing_filters),
+    q: Optional[str] = Query(None, max_length=200, description="Full-text search over description, location, transportation and remarks"),
+    sort_by: Optional[str] = Query(None, regex="^(createdAt|sale_price|relevance)$", description="Defaults to relevance with q, createdAt otherwise"),
     sort_order: Optional[str] = Query("desc", regex="^(asc|desc)$"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from a previous response; takes precedence over page"),
+    estimate_total: bool = Query(False, description="Return an estimated total_count for unfiltered queries"),
+    view: str = Query("full", regex="^(full|card)$", description="card returns only the first image and the fields shown in grid views"),
+    fields: Optional[List[str]] = Query(None, description="Return only these fields; overrides view"),
 ):
     """Get listings - requires active subscription"""
-    results = get_all_listings_filtered(
-        prefecture=prefecture,
-        layout=layout,
-        sale_price_min=sale_price_min,
-        sale_price_max=sale_price_max,
-        building_area_min=building_area_min,
-        building_area_max=building_area_max,
-        land_area_min=land_area_min,
-        land_area_max=land_area_max,
-        construction_year_min=construction_year_min,
-        construction_year_max=construction_year_max,
-        sort_by=sort_by,
-        sort_order=sort_order,
-        page=page,
-        limit=limit
-    )
-    return results
+    if fields:
+        unknown = unknown_fields(fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        fields = sorted(set(fields))
+
+    params = {
+        **filters,
+        "q": q.strip() if q and q.strip() else None,
+        "sort_by": sort_by,
+        "sort_order": sort_order,
+        "page": page,
+        "limit": limit,
+        "cursor": cursor,
+        "estimate_total": estimate_total,
+        "view": view,
+        "fields": fields,
+    }
+    # The page only changes when the data version does, so the ETag can be checked
+    # before touching the cache or the database
+    version = get_data_version()
+    etag = make_etag("listings", version, params)
+    cache_control = settings.LISTINGS_CACHE_CONTROL
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+
+    try:
+        results = listings_cache.get_or_compute(
+            params,
+            version,
+            lambda: get_all_listings_filtered(**params)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ListingJSONResponse(results, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+@router.get("/listings/facets")
+def get_listings_facets(
+    request: Request,
+    current_user: User = Depends(get_current_subscribed_user),  # Require authenticated user with subscription
+    filters: dict = Depends(listing_filters),
+    q: Optional[str] = Query(None, max_length=200, description="Full-text search, as for /listings"),
+):
+    """Get prefecture, layout and price-bucket counts for the current filters"""
+    params = {**filters, "q": q.strip() if q and q.strip() else None}
+    version = get_data_version()
+    etag = make_etag("facets", version, params)
+    cache_control = settings.LISTINGS_CACHE_CONTROL
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+
+    results = facets_cache.get_or_compute(params, version, lambda: get_listing_facets(**params))
+    return ListingJSONResponse(results, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+@router.get("/listings/locations/autocomplete", response_model=List[LocationSuggestion])
+def autocomplete_locations(
+    q: str = Query(..., min_length=1, max_length=50, description="Start of a municipality name"),
+    prefecture: Optional[str] = Query(None),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_subscribed_user),
+):
+    """Suggest municipalities as the user types, with how many listings each has"""
+    return location_index.suggest(q, prefecture, limit)
+
+
+@router.get("/sources", response_model=List[SourceInfo])
+def get_sources(
+    current_user: User = Depends(get_current_subscribed_user),
+):
+    """Get the listing sources and how many listings each one has"""
+    return sorted(source_registry.sources.values(), key=lambda info: info.source)
+
+
+@router.post("/listings/batch")
+def get_listings_batch(
+    request: BatchListingsRequest,
+    current_user: User = Depends(get_current_subscribed_user),  # Require authenticated user with subscription
+):
+    """Get several listings by ID in one request, in the order requested"""
+    if len(request.ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} listing IDs can be requested at once")
+    unknown = unknown_fields(request.fields or [])
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    found = find_listings_by_ids(request.ids, request.fields)
+    results = []
+    missing = []
+    for listing_id in request.ids:
+        try:
+            listing = found.get(format_listing_id(parse_listing_id(listing_id)))
+        except ValueError:
+            listing = None
+        if listing is None:
+            missing.append(listing_id)
+        else:
+            results.append(listing)
+
+    return ListingJSONResponse({"results": results, "missing": missing})
 
 
 @router.get("/listings/{listing_id}")
 def get_listing_by_id(
+    request: Request,
     listing_id: str,
     current_user: User = Depends(get_current_subscribed_user),  # Require authenticated user with subscription
 ):
     """Get a specific listing by ID"""
     try:
-        # Convert string ID to UUID
-        uuid_value = uuid.UUID(listing_id)
-        
-        # Search for the listing across all collections
-        collection_names = list(db.list_collection_names())
-        for collection_name in collection_names:
-            listing = db[collection_name].find_one({"_id": bson.Binary.from_uuid(uuid_value)})
-            if listing:
-                # Convert _id to string for JSON serialization
-                listing["_id"] = str(listing["_id"])
-                return listing
-        
-        raise HTTPException(status_code=404, detail="Listing not found")
-        
+        listing_key = parse_listing_id(listing_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid listing ID format")
+
+    # Every source lives in the same collection, so this is a single _id point lookup
+    listing = source_registry.collection.find_one({"_id": listing_key})
+    if not listing:
+        raise HTTPException(status_code=404, detail="Listing not found")
+
+    # Convert _id to string for JSON serialization
+    listing["_id"] = format_listing_id(listing["_id"])
+    return conditional_response(request, ListingJSONResponse(listing), settings.LISTING_DETAIL_CACHE_CONTROL)
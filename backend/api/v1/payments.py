@@ -1,12 +1,13 @@
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from core.models import (
     SubscriptionCreateWithUser, SubscriptionCreate, PaymentResponse, 
     User
 )
-from core.auth import get_current_active_user, get_user_by_email
+from core.auth import get_current_active_user, get_user_by_email, invalidate_entitlement
 from core.config import settings
-from core.database import user_db
+from core.database import async_user_db
 from core.payments import (
     PLAN_PRICE,
     process_stripe_subscription_with_user,
@@ -71,8 +72,8 @@ async def renew_subscription(
     """Renew an expired or cancelled subscription"""
     
     # Check if user has an existing subscription
-    subscriptions_collection = user_db["subscriptions"]
-    existing_subscription = subscriptions_collection.find_one({
+    subscriptions_collection = async_user_db["subscriptions"]
+    existing_subscription = await subscriptions_collection.find_one({
         "user_id": current_user.id
     }, sort=[("created_at", -1)])  # Get most recent subscription
     
@@ -124,8 +125,8 @@ async def create_subscription_for_user(
     """Create a new subscription for an existing authenticated user"""
     
     # Check if user already has an active subscription
-    subscriptions_collection = user_db["subscriptions"]
-    existing_subscription = subscriptions_collection.find_one({
+    subscriptions_collection = async_user_db["subscriptions"]
+    existing_subscription = await subscriptions_collection.find_one({
         "user_id": current_user.id,
         "status": "active"
     })
@@ -160,8 +161,8 @@ async def create_subscription_for_user(
 @router.get("/subscription")
 async def get_user_subscription(current_user: User = Depends(get_current_active_user)):
     """Get current user's subscription information"""
-    subscriptions_collection = user_db["subscriptions"]
-    subscription_doc = subscriptions_collection.find_one({
+    subscriptions_collection = async_user_db["subscriptions"]
+    subscription_doc = await subscriptions_collection.find_one({
         "user_id": current_user.id
     }, sort=[("created_at", -1)])  # Get most recent subscription
     
@@ -176,8 +177,8 @@ async def get_user_subscription(current_user: User = Depends(get_current_active_
 @router.post("/cancel-subscription")
 async def cancel_subscription(current_user: User = Depends(get_current_active_user)):
     """Cancel user's subscription"""
-    subscriptions_collection = user_db["subscriptions"]
-    subscription_doc = subscriptions_collection.find_one({
+    subscriptions_collection = async_user_db["subscriptions"]
+    subscription_doc = await subscriptions_collection.find_one({
         "user_id": current_user.id,
         "status": "active"
     })
@@ -195,11 +196,12 @@ async def cancel_subscription(current_user: User = Depends(get_current_active_us
         if subscription_doc.get("stripe_subscription_id"):
             try:
                 # First, get the current subscription status from Stripe
-                stripe_subscription = stripe.Subscription.retrieve(subscription_doc["stripe_subscription_id"])
+                stripe_subscription = await run_in_threadpool(stripe.Subscription.retrieve, subscription_doc["stripe_subscription_id"])
                 
                 if stripe_subscription.status == "active":
                     # Only modify if subscription is still active
-                    stripe.Subscription.modify(
+                    await run_in_threadpool(
+                        stripe.Subscription.modify,
                         subscription_doc["stripe_subscription_id"],
                         cancel_at_period_end=True
                     )
@@ -217,13 +219,14 @@ async def cancel_subscription(current_user: User = Depends(get_current_active_us
                 message = "Subscription cancelled in our system. Please contact support if you continue to be charged."
         
         # Update subscription status to indicate it's cancelled
-        subscriptions_collection.update_one(
+        await subscriptions_collection.update_one(
             {"_id": subscription_doc["_id"]},
             {"$set": {
                 "status": "cancelled",
                 "updated_at": datetime.utcnow()
             }}
         )
+        invalidate_entitlement(current_user.id)
         
         return {"message": message}
         
@@ -239,8 +242,8 @@ async def reactivate_subscription(current_user: User = Depends(get_current_activ
     """Reactivate a cancelled subscription that's still within the active period"""
     
     # Check if user has a cancelled subscription that can be reactivated
-    subscriptions_collection = user_db["subscriptions"]
-    existing_subscription = subscriptions_collection.find_one({
+    subscriptions_collection = async_user_db["subscriptions"]
+    existing_subscription = await subscriptions_collection.find_one({
         "user_id": current_user.id,
         "status": "cancelled"
     }, sort=[("created_at", -1)])  # Get most recent cancelled subscription
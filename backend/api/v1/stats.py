@@ -0,0 +1,118 @@
+import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from core.database import listings_db, MARKET_STATS_COLLECTION, PRICE_INDEX_COLLECTION
+from core.models import User, MarketStats, PriceIndexResponse
+from core.auth import get_current_subscribed_user
+
+router = APIRouter()
+
+# Ranges up to DAILY_MAX_DAYS are charted per day, up to WEEKLY_MAX_DAYS per week and
+# longer ranges per month, so a chart never gets more than a few hundred points
+DAILY_MAX_DAYS = 120
+WEEKLY_MAX_DAYS = 3 * 365
+DEFAULT_RANGE_DAYS = 365
+
+PRICE_INDEX_FIELDS = [
+    "p25_price_yen",
+    "median_price_yen",
+    "p75_price_yen",
+    "p25_price_per_sqm_yen",
+    "median_price_per_sqm_yen",
+    "p75_price_per_sqm_yen",
+]
+
+
+def pick_granularity(start: datetime.datetime, end: datetime.datetime) -> str:
+    days = (end - start).days
+    if days <= DAILY_MAX_DAYS:
+        return "day"
+    if days <= WEEKLY_MAX_DAYS:
+        return "week"
+    return "month"
+
+
+def count_weighted_accumulators(field):
+    """$group accumulators for a count-weighted mean of field, skipping weeks without a value"""
+    has_value = {"$isNumber": f"${field}"}
+    return {
+        f"{field}_total": {"$sum": {"$cond": [has_value, {"$multiply": [f"${field}", "$count"]}, 0]}},
+        f"{field}_weight": {"$sum": {"$cond": [has_value, "$count", 0]}},
+    }
+
+
+def count_weighted_mean(field):
+    """Finish the mean started by count_weighted_accumulators"""
+    total, weight = f"${field}_total", f"${field}_weight"
+    return {"$cond": [{"$gt": [weight, 0]}, {"$divide": [total, weight]}, None]}
+
+
+@router.get("/market", response_model=List[MarketStats])
+def get_market_stats(
+    current_user: User = Depends(get_current_subscribed_user),  # Require authenticated user with subscription
+    prefecture: Optional[str] = Query(None),
+    property_type: Optional[str] = Query(None, description='"all" returns one row per prefecture covering every property type'),
+):
+    """Get median prices, price per sqm and listing counts by prefecture and property type"""
+    query = {}
+    if prefecture:
+        query["prefecture"] = prefecture
+    if property_type:
+        query["property_type"] = property_type
+
+    # One precomputed document per prefecture and property type, so this stays small
+    # however many listings there are
+    stats = listings_db[MARKET_STATS_COLLECTION].find(query, {"_id": 0, "refresh_id": 0})
+    return list(stats.sort([("prefecture", 1), ("property_type", 1)]))
+
+
+@router.get("/price-index", response_model=PriceIndexResponse)
+def get_price_index(
+    current_user: User = Depends(get_current_subscribed_user),  # Require authenticated user with subscription
+    prefecture: str = Query(...),
+    property_type: str = Query("all", description='"all" covers every property type'),
+    start: Optional[datetime.date] = Query(None, description="Defaults to one year before end"),
+    end: Optional[datetime.date] = Query(None, description="Defaults to today"),
+    granularity: Optional[str] = Query(None, regex="^(day|week|month)$", description="Chosen from the range if omitted"),
+):
+    """Get price percentiles over time for a prefecture, downsampled to fit the range"""
+    end_at = datetime.datetime.combine(end or datetime.datetime.utcnow().date(), datetime.time.max)
+    start_at = datetime.datetime.combine(start, datetime.time.min) if start else end_at - datetime.timedelta(days=DEFAULT_RANGE_DAYS)
+    if start_at > end_at:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    granularity = granularity or pick_granularity(start_at, end_at)
+
+    match = {
+        # Months are built from the weekly rollups
+        "meta.granularity": "day" if granularity == "day" else "week",
+        "meta.prefecture": prefecture,
+        "meta.property_type": property_type,
+        "period_start": {"$gte": start_at, "$lte": end_at},
+    }
+    pipeline = [{"$match": match}, {"$sort": {"period_start": 1}}]
+    if granularity == "month":
+        # Percentiles can't be merged exactly, so each month reports the count-weighted
+        # mean of its weeks' values. Weeks belong to the month they start in.
+        pipeline += [
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$period_start", "unit": "month"}},
+                "count": {"$sum": "$count"},
+                **{name: accumulator
+                   for field in PRICE_INDEX_FIELDS
+                   for name, accumulator in count_weighted_accumulators(field).items()},
+            }},
+            {"$set": {
+                "period_start": "$_id",
+                **{field: count_weighted_mean(field) for field in PRICE_INDEX_FIELDS},
+            }},
+            {"$sort": {"period_start": 1}},
+        ]
+    pipeline.append({"$project": {"_id": 0, "period_start": 1, "count": 1, **{field: 1 for field in PRICE_INDEX_FIELDS}}})
+
+    points = list(listings_db[PRICE_INDEX_COLLECTION].aggregate(pipeline))
+    return {
+        "prefecture": prefecture,
+        "property_type": property_type,
+        "granularity": granularity,
+        "points": points,
+    }
@@ -6,15 +6,26 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from core.config import settings
 from core.models import TokenData, User, UserInDB
-from core.database import user_db
+from core.database import async_user_db
 from core.models import UserRole
+from core.password_pool import PasswordPool, PasswordPoolFull
+from core.cache import TTLCache
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_pool = PasswordPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="v1/auth/login")
 
+# Per-worker caches for the lookups every protected request makes. Users are keyed
+# by token subject (email); entitlements map user id to the end of the subscription
+# period. Only active subscriptions are cached, so a new subscription is seen
+# immediately, while changes that revoke access are invalidated explicitly here and
+# reach the other workers within AUTH_CACHE_SECONDS.
+user_cache = TTLCache(ttl=settings.AUTH_CACHE_SECONDS, maxsize=10000)
+entitlement_cache = TTLCache(ttl=settings.AUTH_CACHE_SECONDS, maxsize=10000)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +34,24 @@ def get_password_hash(password: str) -> str:
     """Generate password hash"""
     return pwd_context.hash(password)
 
+async def run_in_password_pool(fn, *args):
+    try:
+        return await password_pool.run(fn, *args)
+    except PasswordPoolFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+async def async_verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash without blocking the event loop"""
+    return await run_in_password_pool(verify_password, plain_password, hashed_password)
+
+async def async_get_password_hash(password: str) -> str:
+    """Generate password hash without blocking the event loop"""
+    return await run_in_password_pool(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -49,20 +78,28 @@ def verify_token(token: str, credentials_exception):
 
 async def get_user_by_email(email: str) -> Optional[UserInDB]:
     """Get user from database by email"""
-    users_collection = user_db["users"]
-    user_doc = users_collection.find_one({"email": email})
+    users_collection = async_user_db["users"]
+    user_doc = await users_collection.find_one({"email": email})
     if user_doc:
         user_doc["id"] = str(user_doc["_id"])
         del user_doc["_id"]
         return UserInDB(**user_doc)
     return None
 
+def invalidate_user(email: str):
+    """Drop a cached user after its document changes"""
+    user_cache.delete(email)
+
+def invalidate_entitlement(user_id: str):
+    """Drop a cached subscription check after the user's subscription changes"""
+    entitlement_cache.delete(user_id)
+
 async def authenticate_user(email: str, password: str) -> Optional[UserInDB]:
     """Authenticate user with email and password"""
     user = await get_user_by_email(email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await async_verify_password(password, user.hashed_password):
         return None
     return user
 
@@ -74,9 +111,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         headers={"WWW-Authenticate": "Bearer"},
     )
     token_data = verify_token(token, credentials_exception)
-    user = await get_user_by_email(email=token_data.email)
+    user = user_cache.get(token_data.email)
     if user is None:
-        raise credentials_exception
+        user = await get_user_by_email(email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        user_cache.set(token_data.email, user)
     
     # Convert UserInDB to User (remove password hash)
     return User(
@@ -95,21 +135,32 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    """Get current user, who must be an admin"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+
 async def get_current_subscribed_user(current_user: User = Depends(get_current_active_user)) -> User:
     """Get current user with active subscription or admin user"""
     # Admin users can bypass subscription requirement
     if current_user.role == UserRole.ADMIN:
         return current_user
     
-    # Check if user has valid subscription (active or cancelled but not yet expired)
-    subscriptions_collection = user_db["subscriptions"]
-    subscription_doc = subscriptions_collection.find_one({
+    now = datetime.utcnow()
+    ends_at = entitlement_cache.get(current_user.id)
+    if ends_at is not None and ends_at > now:
+        return current_user
+
+    # Check if user has valid subscription (active or cancelled but not yet expired).
+    # Served by the subscriptions (user_id, status, ends_at) index.
+    subscriptions_collection = async_user_db["subscriptions"]
+    subscription_doc = await subscriptions_collection.find_one({
         "user_id": current_user.id,
-        "$or": [
-            {"status": "active", "ends_at": {"$gt": datetime.utcnow()}},
-            {"status": "cancelled", "ends_at": {"$gt": datetime.utcnow()}}  # Allow cancelled subs until period end
-        ]
-    })
+        "status": {"$in": ["active", "cancelled"]},  # Allow cancelled subs until period end
+        "ends_at": {"$gt": now}
+    }, projection={"ends_at": 1}, sort=[("ends_at", -1)])
     
     if not subscription_doc:
         raise HTTPException(
@@ -117,4 +168,5 @@ async def get_current_subscribed_user(current_user: User = Depends(get_current_a
             detail="Active subscription required to access this resource"
         )
     
+    entitlement_cache.set(current_user.id, subscription_doc["ends_at"])
     return current_user 
\ No newline at end of file
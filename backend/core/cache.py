@@ -0,0 +1,160 @@
+import time
+import pickle
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from bson import json_util
+from core.config import settings
+from core.singleflight import SingleFlight
+
+
+class TTLCache:
+    """Small thread-safe in-process cache whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class CacheBackend(ABC):
+    """Storage for serialized cache entries. Subclasses decide where the bytes live."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes):
+        ...
+
+
+class LocalCacheBackend(CacheBackend):
+    """
+    LRU cache held in this process, bounded by entry count and total bytes.
+
+    Each uvicorn worker gets its own copy, so this is also the stand-in used when
+    no shared backend is configured.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._data[key] = value
+            self._size += len(value)
+            while len(self._data) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache shared by all API workers, stored in Redis with a TTL (Redis handles eviction)"""
+
+    def __init__(self, url: str, ttl: int, prefix: str = "akiya:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+
+class ResultCache:
+    """
+    Caches query results keyed by the normalized query parameters and the current
+    data version. Crawlers and cleanup bump the data version whenever listings
+    change, so entries from older versions are simply never read again and age
+    out of the backend.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str):
+        self.backend = backend
+        self.namespace = namespace
+        self._in_flight = SingleFlight()
+
+    def make_key(self, params: dict, version: int) -> str:
+        digest = hashlib.sha1(json_util.dumps(params, sort_keys=True).encode()).hexdigest()
+        return f"{self.namespace}:{version}:{digest}"
+
+    def get_or_compute(self, params: dict, version: int, compute: Callable[[], Any]):
+        """
+        Return the cached result or compute and store it. Concurrent misses for the
+        same key in this process share a single compute call, so an invalidation
+        doesn't send every waiting request to Mongo at once.
+        """
+        key = self.make_key(params, version)
+        value = self.backend.get(key)
+        if value is not None:
+            return pickle.loads(value)
+
+        def compute_and_store():
+            # A call that just finished may have stored the entry after the check above
+            value = self.backend.get(key)
+            if value is not None:
+                return pickle.loads(value)
+            result = compute()
+            self.backend.set(key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+            return result
+
+        return self._in_flight.do(key, compute_and_store)
+
+
+def create_cache_backend() -> CacheBackend:
+    """Build the backend selected by CACHE_BACKEND"""
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.REDIS_URL, ttl=settings.RESULT_CACHE_TTL_SECONDS)
+    return LocalCacheBackend(
+        max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+        max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    )
+
+
+cache_backend = create_cache_backend()
@@ -12,6 +12,39 @@ class Settings(BaseSettings):
     CRAWLER_DB: str  # For listings data
     USER_DB: str     # For user and subscription data
     ENVIRONMENT: str
+    ENSURE_INDEXES_ON_STARTUP: bool = True
+
+    # Listings query settings
+    LISTINGS_COUNT_CACHE_SECONDS: int = 60
+
+    # Result cache ("local" keeps a per-worker LRU, "redis" shares entries across workers)
+    CACHE_BACKEND: str = "local"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    RESULT_CACHE_MAX_ENTRIES: int = 512
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_TTL_SECONDS: int = 3600
+    DATA_VERSION_CHECK_SECONDS: float = 2.0
+    SOURCE_REGISTRY_REFRESH_SECONDS: float = 300.0
+    LOCATION_INDEX_REFRESH_SECONDS: float = 300.0
+
+    # bcrypt runs in a small per-worker thread pool; requests beyond the queue limit get a 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # How long each worker trusts a looked-up user and an active subscription
+    AUTH_CACHE_SECONDS: int = 30
+
+    # Responses smaller than this many bytes are sent uncompressed
+    GZIP_MINIMUM_SIZE: int = 1000
+    GZIP_COMPRESS_LEVEL: int = 6
+
+    # Cache-Control per route. Listing responses are per-subscriber, so they must not
+    # be stored by the shared Apache proxy; ETags let browsers revalidate with a 304.
+    LISTINGS_CACHE_CONTROL: str = "private, no-cache"
+    LISTING_DETAIL_CACHE_CONTROL: str = "private, max-age=300"
+    # Crawlers save each image once under a fresh random name (images/<site>/<listing>/<uuid4>.jpg)
+    # and never rewrite it, so a URL always refers to the same bytes
+    IMAGES_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
 
     @property
     def database_url(self):
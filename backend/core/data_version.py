@@ -0,0 +1,31 @@
+import time
+import threading
+from core.config import settings
+from core.database import listings_db
+
+# Written by the crawlers and cleanup whenever listings are added or removed
+META_COLLECTION = "meta"
+DATA_VERSION_ID = "data_version"
+
+_lock = threading.Lock()
+_cached_version = None
+_checked_at = 0.0
+
+
+def get_data_version() -> int:
+    """
+    Current listings data version. The value is re-read from Mongo at most once
+    every DATA_VERSION_CHECK_SECONDS so it doesn't add a round trip per request.
+    """
+    global _cached_version, _checked_at
+
+    now = time.monotonic()
+    if _cached_version is not None and now - _checked_at < settings.DATA_VERSION_CHECK_SECONDS:
+        return _cached_version
+
+    with _lock:
+        if _cached_version is None or now - _checked_at >= settings.DATA_VERSION_CHECK_SECONDS:
+            doc = listings_db[META_COLLECTION].find_one({"_id": DATA_VERSION_ID})
+            _cached_version = doc["version"] if doc else 0
+            _checked_at = time.monotonic()
+        return _cached_version
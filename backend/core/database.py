@@ -1,5 +1,5 @@
 from core.config import settings
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
 
 # Create MongoDB client
 client = MongoClient(settings.database_url)
@@ -8,5 +8,28 @@ client = MongoClient(settings.database_url)
 listings_db = client[settings.CRAWLER_DB]  # For property listings
 user_db = client[settings.USER_DB]         # For users and subscriptions
 
+# Async client for user data accessed from async endpoints, so database round trips
+# don't block the event loop
+async_client = AsyncMongoClient(settings.database_url)
+async_user_db = async_client[settings.USER_DB]
+
 # Legacy reference for existing listings code
-db = listings_db
\ No newline at end of file
+db = listings_db
+
+# All crawled listings live in one collection, tagged with a "source" field
+LISTINGS_COLLECTION = "listings"
+listings_collection = listings_db[LISTINGS_COLLECTION]
+
+# Compact per-listing summaries (filter/sort fields and card display fields) kept in
+# sync by the crawlers; list queries page through these instead of full documents
+LISTING_CARDS_COLLECTION = "listing_cards"
+listing_cards_collection = listings_db[LISTING_CARDS_COLLECTION]
+
+# Per-prefecture statistics materialized by the crawlers after each crawl and cleanup
+MARKET_STATS_COLLECTION = "market_stats"
+
+# Listing counts per municipality, kept current by the crawlers; backs location autocomplete
+LOCATIONS_COLLECTION = "locations"
+
+# Daily and weekly price rollups (a time-series collection) written by price_index.py
+PRICE_INDEX_COLLECTION = "price_index"
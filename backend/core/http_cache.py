@@ -0,0 +1,59 @@
+import hashlib
+from bson import json_util
+from fastapi import Request, Response
+from fastapi.staticfiles import StaticFiles
+
+
+def make_etag(*parts) -> str:
+    """
+    Weak ETag from the values that determine a response. Weak because the gzip
+    middleware may re-encode the body without touching the header.
+    """
+    digest = hashlib.sha1(json_util.dumps(parts, sort_keys=True).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def body_etag(body: bytes) -> str:
+    """Weak ETag from a rendered response body"""
+    return f'W/"{hashlib.sha1(body).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def conditional_response(request: Request, response: Response, cache_control: str) -> Response:
+    """
+    Tag an already rendered response with an ETag of its body, and answer with a
+    304 instead if the client's copy is current.
+    """
+    etag = body_etag(response.body)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that adds a fixed Cache-Control header to every file it serves"""
+
+    def __init__(self, *args, cache_control: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = self.cache_control
+        return response
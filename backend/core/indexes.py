@@ -0,0 +1,217 @@
+"""
+Index definitions for the query shapes the API actually runs.
+
+ensure_indexes() is idempotent and runs at application startup. It can also be
+run by hand, together with a query plan check that fails if any representative
+query falls back to a collection scan:
+
+    python -m core.indexes           # create missing indexes
+    python -m core.indexes --check   # create indexes, then explain() the representative queries
+"""
+import sys
+import logging
+import argparse
+import datetime
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from core.database import listings_db, user_db, LISTINGS_COLLECTION, LISTING_CARDS_COLLECTION, MARKET_STATS_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# Listing filters are equality matches on Prefecture and Building - Layout followed by a
+# sort on createdAt or Sale Price, with _id as the pagination tie-breaker. Each compound
+# index puts the equality fields first and the sort key after them so one index both
+# narrows the match and returns documents already in order. List queries run against
+# the compact listing_cards collection, so that is where these indexes live.
+LISTING_CARD_INDEXES = [
+    IndexModel([("createdAt", DESCENDING), ("_id", DESCENDING)], name="createdAt_id"),
+    IndexModel([("Sale Price", ASCENDING), ("_id", ASCENDING)], name="price_id"),
+    IndexModel([("Prefecture", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+               name="prefecture_createdAt_id"),
+    IndexModel([("Prefecture", ASCENDING), ("Sale Price", ASCENDING), ("_id", ASCENDING)],
+               name="prefecture_price_id"),
+    IndexModel([("Building - Layout", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+               name="layout_createdAt_id"),
+    IndexModel([("source", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+               name="source_createdAt_id"),
+    IndexModel([("municipality", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+               name="municipality_createdAt_id"),
+    # near/bbox map searches; listings without a location are left out of the index
+    IndexModel([("location", GEOSPHERE), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+               name="location_createdAt_id"),
+    IndexModel([("Prefecture", ASCENDING), ("Building - Layout", ASCENDING),
+                ("createdAt", DESCENDING), ("_id", DESCENDING)],
+               name="prefecture_layout_createdAt_id"),
+    IndexModel([("Prefecture", ASCENDING), ("Building - Layout", ASCENDING),
+                ("Sale Price", ASCENDING), ("_id", ASCENDING)],
+               name="prefecture_layout_price_id"),
+]
+
+LISTING_INDEXES = [
+    # Crawlers look up every scraped link to stop at the first already-known listing
+    IndexModel([("link", ASCENDING)], name="link"),
+    # Full-text search (the q parameter); locations and stations weigh more than free text
+    IndexModel([("description", TEXT), ("Property Location", TEXT), ("Transportation", TEXT), ("Remarks", TEXT)],
+               weights={"Property Location": 5, "Transportation": 3, "description": 1, "Remarks": 1},
+               default_language="english", name="listing_text"),
+]
+
+# Every protected request looks up its user by email and checks for an unexpired
+# active or cancelled subscription; webhooks find subscriptions by their Stripe id.
+USER_INDEXES = [
+    IndexModel([("email", ASCENDING)], name="email", unique=True),
+]
+
+SUBSCRIPTION_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("ends_at", DESCENDING)],
+               name="user_status_ends_at"),
+    IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_createdAt"),
+    IndexModel([("stripe_subscription_id", ASCENDING)], name="stripe_subscription_id"),
+]
+
+FAVORITE_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("listing_id", ASCENDING)], name="user_listing"),
+    IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_createdAt"),
+]
+
+MARKET_STATS_INDEXES = [
+    IndexModel([("prefecture", ASCENDING), ("property_type", ASCENDING)], name="prefecture_property_type"),
+]
+
+INDEXES = [
+    (listings_db, LISTING_CARDS_COLLECTION, LISTING_CARD_INDEXES),
+    (listings_db, LISTINGS_COLLECTION, LISTING_INDEXES),
+    (listings_db, MARKET_STATS_COLLECTION, MARKET_STATS_INDEXES),
+    (user_db, "users", USER_INDEXES),
+    (user_db, "subscriptions", SUBSCRIPTION_INDEXES),
+    (user_db, "favorites", FAVORITE_INDEXES),
+]
+
+PRICE_FILTER = {"$exists": True, "$type": "number"}
+
+# (description, database, collection, filter, sort) for each query shape the API runs
+REPRESENTATIVE_QUERIES = [
+    ("newest listings", listings_db, LISTING_CARDS_COLLECTION,
+     {"Sale Price": PRICE_FILTER},
+     [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("cheapest listings", listings_db, LISTING_CARDS_COLLECTION,
+     {"Sale Price": {**PRICE_FILTER, "$lte": 50000}},
+     [("Sale Price", ASCENDING), ("_id", ASCENDING)]),
+    ("newest in prefecture", listings_db, LISTING_CARDS_COLLECTION,
+     {"Prefecture": "hokkaido", "Sale Price": PRICE_FILTER},
+     [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("cheapest in prefecture", listings_db, LISTING_CARDS_COLLECTION,
+     {"Prefecture": "hokkaido", "Sale Price": PRICE_FILTER},
+     [("Sale Price", ASCENDING), ("_id", ASCENDING)]),
+    ("newest by layout", listings_db, LISTING_CARDS_COLLECTION,
+     {"Building - Layout": "3LDK", "Sale Price": PRICE_FILTER},
+     [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("newest in prefecture by layout", listings_db, LISTING_CARDS_COLLECTION,
+     {"Prefecture": "hokkaido", "Building - Layout": "3LDK", "Sale Price": PRICE_FILTER},
+     [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("cheapest in prefecture by layout", listings_db, LISTING_CARDS_COLLECTION,
+     {"Prefecture": "hokkaido", "Building - Layout": "3LDK", "Sale Price": {**PRICE_FILTER, "$gte": 10000}},
+     [("Sale Price", ASCENDING), ("_id", ASCENDING)]),
+    ("newest from source", listings_db, LISTING_CARDS_COLLECTION,
+     {"source": "nifty", "Sale Price": PRICE_FILTER},
+     [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("newest near a point", listings_db, LISTING_CARDS_COLLECTION,
+     {"location": {"$geoWithin": {"$centerSphere": [[141.35, 43.06], 10 / 6378.1]}}, "Sale Price": PRICE_FILTER},
+     [("createdAt", DESCENDING), ("_id", DESCENDING)]),
+    ("crawler link lookup", listings_db, LISTINGS_COLLECTION,
+     {"link": "https://example.com/listing"},
+     None),
+    ("text search", listings_db, LISTINGS_COLLECTION,
+     {"$text": {"$search": "station"}, "Prefecture": "hokkaido"},
+     None),
+    ("user by email", user_db, "users",
+     {"email": "user@example.com"},
+     None),
+    ("active subscription", user_db, "subscriptions",
+     {"user_id": "000000000000000000000000", "status": {"$in": ["active", "cancelled"]},
+      "ends_at": {"$gt": datetime.datetime(2000, 1, 1)}},
+     [("ends_at", DESCENDING)]),
+    ("latest subscription", user_db, "subscriptions",
+     {"user_id": "000000000000000000000000"},
+     [("created_at", DESCENDING)]),
+    ("subscription webhook lookup", user_db, "subscriptions",
+     {"stripe_subscription_id": "sub_example"},
+     None),
+    ("favorite lookup", user_db, "favorites",
+     {"user_id": "000000000000000000000000", "listing_id": "00000000-0000-0000-0000-000000000000"},
+     None),
+    ("user favorites", user_db, "favorites",
+     {"user_id": "000000000000000000000000"},
+     [("created_at", DESCENDING)]),
+]
+
+
+def ensure_indexes():
+    """
+    Create any missing indexes. Existing indexes with the same spec are left alone.
+    A failure on one collection (e.g. duplicate emails blocking the unique index)
+    doesn't stop the others; the failures are raised together at the end.
+    """
+    errors = []
+    for database, collection_name, indexes in INDEXES:
+        try:
+            names = database[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on {database.name}.{collection_name}: {e}")
+            errors.append(f"{database.name}.{collection_name}")
+            continue
+        logger.info(f"Ensured indexes on {database.name}.{collection_name}: {', '.join(names)}")
+    if errors:
+        raise RuntimeError(f"Index creation failed on {', '.join(errors)}")
+
+
+def find_stages(plan):
+    """Collect every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(find_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(find_stages(value))
+    return stages
+
+
+def check_query_plans():
+    """Explain each representative query. Returns the descriptions of those that scan a whole collection."""
+    failures = []
+    for description, database, collection_name, query, sort in REPRESENTATIVE_QUERIES:
+        cursor = database[collection_name].find(query).limit(20)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = cursor.explain()
+        stages = find_stages(explanation["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages:
+            failures.append(description)
+            logger.error(f"{description}: COLLSCAN ({' <- '.join(stages)})")
+        else:
+            logger.info(f"{description}: {' <- '.join(stages)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the API's MongoDB indexes")
+    parser.add_argument("--check", action="store_true",
+                        help="Fail if any representative query falls back to a collection scan")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    ensure_indexes()
+
+    if args.check:
+        failures = check_query_plans()
+        if failures:
+            logger.error(f"{len(failures)} queries fall back to COLLSCAN: {', '.join(failures)}")
+            sys.exit(1)
+        logger.info("All representative queries use an index")
+
+
+if __name__ == "__main__":
+    main()
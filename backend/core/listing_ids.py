@@ -0,0 +1,17 @@
+import uuid
+import bson
+
+
+def parse_listing_id(listing_id: str) -> bson.Binary:
+    """
+    Convert an API listing ID (a UUID string) into the listings collection _id.
+    Raises ValueError if it isn't a valid UUID.
+    """
+    # Clean the string - remove any whitespace or quotes
+    cleaned = listing_id.strip().strip('"').strip("'")
+    return bson.Binary.from_uuid(uuid.UUID(cleaned))
+
+
+def format_listing_id(listing_id: bson.Binary) -> str:
+    """Convert a listings collection _id back into its API string form"""
+    return str(listing_id.as_uuid())
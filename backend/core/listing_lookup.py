@@ -0,0 +1,71 @@
+from typing import Dict, List, Optional
+from core.registry import source_registry
+from core.listing_ids import parse_listing_id, format_listing_id
+
+# Upper bound on IDs resolved in one batch request
+MAX_BATCH_IDS = 100
+
+# Fields returned for each listing in list views
+LISTING_PROJECTION = {
+    "_id": 1,
+    "source": 1,
+    "Prefecture": 1,
+    "Building - Layout": 1,
+    "Sale Price": 1,
+    "link": 1,
+    "Building - Area": 1,
+    "Land - Area": 1,
+    "Building - Construction Date": 1,
+    "Building - Structure": 1,
+    "Property Type": 1,
+    "Property Location": 1,
+    "Transportation": 1,
+    "createdAt": 1,
+    "images": 1,
+    "Contact Number": 1,
+    "Reference URL": 1,
+    "building_area_sqm": 1,
+    "land_area_sqm": 1,
+    "construction_year": 1,
+    "municipality": 1,
+    "location": 1,
+    "geo_precision": 1
+}
+
+
+def unknown_fields(fields: List[str]) -> List[str]:
+    """Requested fields that aren't part of the public listing projection"""
+    return sorted(set(fields) - set(LISTING_PROJECTION))
+
+
+def build_projection(fields: Optional[List[str]]) -> Optional[dict]:
+    """Mongo projection for the requested fields (None returns whole documents)"""
+    if not fields:
+        return None
+    projection = {field: LISTING_PROJECTION[field] for field in fields}
+    projection["_id"] = 1
+    return projection
+
+
+def find_listings_by_ids(listing_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Resolve many listing IDs with a single $in query on _id. Callers validate fields
+    with unknown_fields first.
+
+    Returns the found listings keyed by their API ID. Malformed and unknown IDs are
+    simply absent from the result.
+    """
+    keys = []
+    for listing_id in listing_ids:
+        try:
+            keys.append(parse_listing_id(listing_id))
+        except ValueError:
+            continue
+    if not keys:
+        return {}
+
+    found = {}
+    for listing in source_registry.collection.find({"_id": {"$in": keys}}, build_projection(fields)):
+        listing["_id"] = format_listing_id(listing["_id"])
+        found[listing["_id"]] = listing
+    return found
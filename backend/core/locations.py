@@ -0,0 +1,105 @@
+import time
+import bisect
+import logging
+import threading
+import unicodedata
+from typing import List, Optional, Tuple
+from pydantic import BaseModel
+from core.config import settings
+from core.database import listings_db, LOCATIONS_COLLECTION
+from core.data_version import get_data_version
+
+logger = logging.getLogger(__name__)
+
+
+class LocationSuggestion(BaseModel):
+    municipality: str
+    prefecture: str
+    listing_count: int
+
+
+def normalize_location_key(text: str) -> str:
+    """Lowercase and strip diacritics, so "otsu" finds "Ōtsu City" """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold().strip()
+
+
+class LocationIndex:
+    """
+    In-memory prefix index of municipality names for autocomplete.
+
+    The crawlers keep a listing count per municipality in the locations collection.
+    Each worker loads it into a list sorted by normalized name, so a prefix lookup is
+    a binary search for the first match plus a scan over the matching range. It is
+    reloaded when LOCATION_INDEX_REFRESH_SECONDS have passed or the data version
+    changes, like the source registry.
+    """
+
+    def __init__(self, collection, refresh_seconds: float):
+        self.collection = collection
+        self.refresh_seconds = refresh_seconds
+        # (sorted keys, entries in the same order), replaced as one object on refresh
+        self._index: Tuple[List[str], List[LocationSuggestion]] = ([], [])
+        self._loaded_at = None
+        self._loaded_version = None
+        self._lock = threading.Lock()
+
+    def _is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        if time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            return True
+        return get_data_version() != self._loaded_version
+
+    def refresh(self):
+        version = get_data_version()
+        rows: List[Tuple[str, LocationSuggestion]] = []
+        for doc in self.collection.find({"count": {"$gt": 0}}, {"prefecture": 1, "municipality": 1, "count": 1}):
+            entry = LocationSuggestion(
+                municipality=doc["municipality"],
+                prefecture=doc["prefecture"],
+                listing_count=doc["count"],
+            )
+            rows.append((normalize_location_key(entry.municipality), entry))
+        rows.sort(key=lambda row: row[0])
+
+        # One attribute store, so a reader never pairs new keys with old entries
+        self._index = ([key for key, _ in rows], [entry for _, entry in rows])
+        self._loaded_at = time.monotonic()
+        self._loaded_version = version
+        logger.info(f"Loaded {len(rows)} locations")
+
+    def _ensure_loaded(self):
+        if not self._is_stale():
+            return
+        with self._lock:
+            if self._is_stale():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep serving the last known locations if the refresh fails
+                    if self._loaded_at is None:
+                        raise
+                    logger.error(f"Failed to refresh locations: {e}")
+                    self._loaded_at = time.monotonic()
+
+    def suggest(self, prefix: str, prefecture: Optional[str] = None, limit: int = 10) -> List[LocationSuggestion]:
+        """Municipalities whose name starts with prefix, most listings first"""
+        self._ensure_loaded()
+        keys, entries = self._index
+        key = normalize_location_key(prefix)
+        if not key:
+            return []
+
+        matches = []
+        start = bisect.bisect_left(keys, key)
+        for i in range(start, len(keys)):
+            if not keys[i].startswith(key):
+                break
+            if prefecture is None or entries[i].prefecture == prefecture:
+                matches.append(entries[i])
+        matches.sort(key=lambda entry: (-entry.listing_count, entry.municipality))
+        return matches[:limit]
+
+
+location_index = LocationIndex(listings_db[LOCATIONS_COLLECTION], settings.LOCATION_INDEX_REFRESH_SECONDS)
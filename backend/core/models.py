@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from pydantic import BaseModel, EmailStr
 from enum import Enum
 
@@ -124,4 +124,48 @@ class DeleteFavorite(BaseModel):
     listing_id: str
 
 class GetFavorites(BaseModel):
-    favorites: List[str]
\ No newline at end of file
+    favorites: List[str]
+
+class FavoriteWithListing(BaseModel):
+    listing_id: str
+    created_at: datetime
+    listing: Optional[Dict[str, Any]] = None  # None if the listing has been delisted
+
+class GetFavoritesWithListings(BaseModel):
+    favorites: List[FavoriteWithListing]
+
+# Listing models
+class BatchListingsRequest(BaseModel):
+    ids: List[str]
+    fields: Optional[List[str]] = None  # Only return these fields (all fields if omitted)
+
+# Market statistics models
+class MarketStats(BaseModel):
+    prefecture: str
+    property_type: str  # "all" for the row covering every property type
+    listing_count: int
+    median_price_yen: Optional[float] = None
+    price_yen_quartiles: Optional[List[float]] = None  # 25th and 75th percentile
+    median_price_usd: Optional[float] = None
+    median_price_per_sqm_yen: Optional[float] = None
+    median_building_area_sqm: Optional[float] = None
+    median_land_area_sqm: Optional[float] = None
+    median_construction_year: Optional[float] = None
+    updatedAt: datetime
+
+# Price index models
+class PriceIndexPoint(BaseModel):
+    period_start: datetime
+    count: int
+    p25_price_yen: Optional[float] = None
+    median_price_yen: Optional[float] = None
+    p75_price_yen: Optional[float] = None
+    p25_price_per_sqm_yen: Optional[float] = None
+    median_price_per_sqm_yen: Optional[float] = None
+    p75_price_per_sqm_yen: Optional[float] = None
+
+class PriceIndexResponse(BaseModel):
+    prefecture: str
+    property_type: str
+    granularity: str  # day, week or month
+    points: List[PriceIndexPoint]
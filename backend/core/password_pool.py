@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPoolFull(Exception):
+    """Raised when too many password operations are already waiting for the pool"""
+
+
+class PasswordPool:
+    """
+    Runs password hashing and verification off the event loop.
+
+    bcrypt is deliberately slow CPU work. Calling it inside an async handler stalls
+    every other request on the worker, so calls go to a small dedicated thread pool
+    instead (the bcrypt extension releases the GIL while hashing, so threads run in
+    parallel). A semaphore limits how many calls run at once, and callers beyond
+    max_pending are rejected rather than queued without bound, so a burst of logins
+    can't starve the default threadpool the sync listing endpoints run in.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self._semaphore = asyncio.Semaphore(workers)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queued = 0
+        self._rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args):
+        with self._lock:
+            if self._queued >= self.max_pending:
+                self._rejected += 1
+                logger.warning(f"Password pool full: {self._queued} queued, {self._in_flight} running")
+                raise PasswordPoolFull()
+            self._queued += 1
+
+        try:
+            await self._semaphore.acquire()
+        finally:
+            # Leaves the queue whether the slot was acquired or the caller was cancelled
+            with self._lock:
+                self._queued -= 1
+
+        try:
+            with self._lock:
+                self._in_flight += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "max_pending": self.max_pending,
+                "rejected": self._rejected,
+            }
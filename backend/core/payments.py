@@ -2,15 +2,16 @@ from datetime import datetime, timedelta
 from typing import Optional
 import stripe
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from bson import ObjectId
 
 from .models import (
     SubscriptionCreateWithUser, SubscriptionCreate, PaymentResponse, 
     Subscription, SubscriptionStatus, User, UserCreate
 )
-from .auth import get_password_hash, get_user_by_email
+from .auth import async_get_password_hash, get_user_by_email, invalidate_entitlement
 from .config import settings
-from .database import user_db
+from .database import async_user_db
 
 # Initialize Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -25,20 +26,27 @@ async def process_stripe_subscription_with_user(
 ) -> PaymentResponse:
     """Process Stripe subscription with new user creation"""
     try:
+        # Hash the password before charging so a busy password pool can't leave a
+        # subscription without an account
+        hashed_password = await async_get_password_hash(subscription_data.password)
+
         # Create Stripe customer
-        customer = stripe.Customer.create(
+        customer = await run_in_threadpool(
+            stripe.Customer.create,
             email=subscription_data.email,
             name=subscription_data.name
         )
         
         # Attach payment method to customer
-        payment_method = stripe.PaymentMethod.attach(
+        payment_method = await run_in_threadpool(
+            stripe.PaymentMethod.attach,
             subscription_data.payment_token,
             customer=customer.id
         )
         
         # Set as default payment method
-        stripe.Customer.modify(
+        await run_in_threadpool(
+            stripe.Customer.modify,
             customer.id,
             invoice_settings={"default_payment_method": payment_method.id}
         )
@@ -51,7 +59,7 @@ async def process_stripe_subscription_with_user(
                 raise Exception("STRIPE_PRODUCT_ID not configured")
             
             # Verify the product exists in Stripe
-            product = stripe.Product.retrieve(product_id)
+            product = await run_in_threadpool(stripe.Product.retrieve, product_id)
             if not product:
                 raise Exception(f"Product with ID {product_id} not found in Stripe")
                 
@@ -76,10 +84,9 @@ async def process_stripe_subscription_with_user(
             }]
         }
         
-        stripe_subscription = stripe.Subscription.create(**subscription_params)
+        stripe_subscription = await run_in_threadpool(stripe.Subscription.create, **subscription_params)
         
         # Create user account
-        hashed_password = get_password_hash(subscription_data.password)
         user_doc = {
             "email": subscription_data.email,
             "name": subscription_data.name,
@@ -90,8 +97,8 @@ async def process_stripe_subscription_with_user(
             "updated_at": datetime.utcnow()
         }
         
-        users_collection = user_db["users"]
-        user_result = users_collection.insert_one(user_doc)
+        users_collection = async_user_db["users"]
+        user_result = await users_collection.insert_one(user_doc)
         user_id = str(user_result.inserted_id)
         
         # Create subscription record
@@ -107,8 +114,8 @@ async def process_stripe_subscription_with_user(
             "updated_at": datetime.utcnow()
         }
         
-        subscriptions_collection = user_db["subscriptions"]
-        subscription_result = subscriptions_collection.insert_one(subscription_doc)
+        subscriptions_collection = async_user_db["subscriptions"]
+        subscription_result = await subscriptions_collection.insert_one(subscription_doc)
         
         return PaymentResponse(
             success=True,
@@ -131,24 +138,27 @@ async def process_stripe_renewal(
     """Process Stripe subscription renewal"""
     try:
         # Get or create Stripe customer
-        customers = stripe.Customer.list(email=user.email, limit=1)
+        customers = await run_in_threadpool(stripe.Customer.list, email=user.email, limit=1)
         
         if customers.data:
             customer = customers.data[0]
         else:
-            customer = stripe.Customer.create(
+            customer = await run_in_threadpool(
+                stripe.Customer.create,
                 email=user.email,
                 name=user.name
             )
         
         # Attach payment method to customer
-        payment_method = stripe.PaymentMethod.attach(
+        payment_method = await run_in_threadpool(
+            stripe.PaymentMethod.attach,
             subscription_data.payment_token,
             customer=customer.id
         )
         
         # Set as default payment method
-        stripe.Customer.modify(
+        await run_in_threadpool(
+            stripe.Customer.modify,
             customer.id,
             invoice_settings={"default_payment_method": payment_method.id}
         )
@@ -161,7 +171,7 @@ async def process_stripe_renewal(
                 raise Exception("STRIPE_PRODUCT_ID not configured")
             
             # Verify the product exists in Stripe
-            product = stripe.Product.retrieve(product_id)
+            product = await run_in_threadpool(stripe.Product.retrieve, product_id)
             if not product:
                 raise Exception(f"Product with ID {product_id} not found in Stripe")
                 
@@ -186,7 +196,7 @@ async def process_stripe_renewal(
             }]
         }
         
-        stripe_subscription = stripe.Subscription.create(**subscription_params)
+        stripe_subscription = await run_in_threadpool(stripe.Subscription.create, **subscription_params)
         
         # Create new subscription record
         subscription_doc = {
@@ -201,8 +211,8 @@ async def process_stripe_renewal(
             "updated_at": datetime.utcnow()
         }
         
-        subscriptions_collection = user_db["subscriptions"]
-        subscription_result = subscriptions_collection.insert_one(subscription_doc)
+        subscriptions_collection = async_user_db["subscriptions"]
+        subscription_result = await subscriptions_collection.insert_one(subscription_doc)
         
         return PaymentResponse(
             success=True,
@@ -224,20 +234,22 @@ async def reactivate_cancelled_subscription(subscription_doc: dict, user: User)
         stripe_subscription_id = subscription_doc.get("stripe_subscription_id")
         if stripe_subscription_id:
             # Remove cancel_at_period_end flag to reactivate the subscription
-            stripe.Subscription.modify(
+            await run_in_threadpool(
+                stripe.Subscription.modify,
                 stripe_subscription_id,
                 cancel_at_period_end=False
             )
         
         # Update subscription status back to active
-        subscriptions_collection = user_db["subscriptions"]
-        subscriptions_collection.update_one(
+        subscriptions_collection = async_user_db["subscriptions"]
+        await subscriptions_collection.update_one(
             {"_id": subscription_doc["_id"]},
             {"$set": {
                 "status": "active",
                 "updated_at": datetime.utcnow()
             }}
         )
+        invalidate_entitlement(subscription_doc["user_id"])
         
         return PaymentResponse(
             success=True,
@@ -260,24 +272,27 @@ async def process_stripe_subscription_for_user(
     """Process Stripe subscription for existing authenticated user"""
     try:
         # Get or create Stripe customer
-        customers = stripe.Customer.list(email=user.email, limit=1)
+        customers = await run_in_threadpool(stripe.Customer.list, email=user.email, limit=1)
         
         if customers.data:
             customer = customers.data[0]
         else:
-            customer = stripe.Customer.create(
+            customer = await run_in_threadpool(
+                stripe.Customer.create,
                 email=user.email,
                 name=user.name
             )
         
         # Attach payment method to customer
-        payment_method = stripe.PaymentMethod.attach(
+        payment_method = await run_in_threadpool(
+            stripe.PaymentMethod.attach,
             subscription_data.payment_token,
             customer=customer.id
         )
         
         # Set as default payment method
-        stripe.Customer.modify(
+        await run_in_threadpool(
+            stripe.Customer.modify,
             customer.id,
             invoice_settings={"default_payment_method": payment_method.id}
         )
@@ -290,7 +305,7 @@ async def process_stripe_subscription_for_user(
                 raise Exception("STRIPE_PRODUCT_ID not configured")
             
             # Verify the product exists in Stripe
-            product = stripe.Product.retrieve(product_id)
+            product = await run_in_threadpool(stripe.Product.retrieve, product_id)
             if not product:
                 raise Exception(f"Product with ID {product_id} not found in Stripe")
                 
@@ -315,7 +330,7 @@ async def process_stripe_subscription_for_user(
             }]
         }
         
-        stripe_subscription = stripe.Subscription.create(**subscription_params)
+        stripe_subscription = await run_in_threadpool(stripe.Subscription.create, **subscription_params)
         
         # Create subscription record
         subscription_doc = {
@@ -330,8 +345,8 @@ async def process_stripe_subscription_for_user(
             "updated_at": datetime.utcnow()
         }
         
-        subscriptions_collection = user_db["subscriptions"]
-        subscription_result = subscriptions_collection.insert_one(subscription_doc)
+        subscriptions_collection = async_user_db["subscriptions"]
+        subscription_result = await subscriptions_collection.insert_one(subscription_doc)
         
         return PaymentResponse(
             success=True,
@@ -354,15 +369,15 @@ async def handle_subscription_payment_succeeded(invoice):
         return
     
     # Update subscription status in database
-    subscriptions_collection = user_db["subscriptions"]
-    subscription_doc = subscriptions_collection.find_one({
+    subscriptions_collection = async_user_db["subscriptions"]
+    subscription_doc = await subscriptions_collection.find_one({
         "stripe_subscription_id": subscription_id
     })
     
     if subscription_doc:
         # Extend subscription period
         new_end_date = datetime.utcnow() + timedelta(days=30)
-        subscriptions_collection.update_one(
+        await subscriptions_collection.update_one(
             {"_id": subscription_doc["_id"]},
             {"$set": {
                 "status": "active",
@@ -370,6 +385,7 @@ async def handle_subscription_payment_succeeded(invoice):
                 "updated_at": datetime.utcnow()
             }}
         )
+        invalidate_entitlement(subscription_doc["user_id"])
 
 
 async def handle_subscription_payment_failed(invoice):
@@ -379,13 +395,13 @@ async def handle_subscription_payment_failed(invoice):
         return
     
     # Update subscription status in database
-    subscriptions_collection = user_db["subscriptions"]
-    subscription_doc = subscriptions_collection.find_one({
+    subscriptions_collection = async_user_db["subscriptions"]
+    subscription_doc = await subscriptions_collection.find_one({
         "stripe_subscription_id": subscription_id
     })
     
     if subscription_doc:
-        subscriptions_collection.update_one(
+        await subscriptions_collection.update_one(
             {"_id": subscription_doc["_id"]},
             {"$set": {
                 "status": "inactive",
@@ -393,6 +409,7 @@ async def handle_subscription_payment_failed(invoice):
                 "updated_at": datetime.utcnow()
             }}
         )
+        invalidate_entitlement(subscription_doc["user_id"])
 
 
 async def handle_subscription_cancelled(subscription):
@@ -404,15 +421,18 @@ async def handle_subscription_cancelled(subscription):
     period_end = datetime.fromtimestamp(subscription['canceled_at'])
     
     # Update subscription status in database
-    subscriptions_collection = user_db["subscriptions"]
-    subscriptions_collection.update_one(
+    subscriptions_collection = async_user_db["subscriptions"]
+    subscription_doc = await subscriptions_collection.find_one_and_update(
         {"stripe_subscription_id": subscription_id},
         {"$set": {
             "status": "cancelled",
             "ends_at": period_end,
             "updated_at": datetime.utcnow()
-        }}
+        }},
+        projection={"user_id": 1}
     )
+    if subscription_doc:
+        invalidate_entitlement(subscription_doc["user_id"])
 
 
 async def handle_subscription_updated(subscription):
@@ -422,7 +442,7 @@ async def handle_subscription_updated(subscription):
         return
     
     # Update subscription details in database
-    subscriptions_collection = user_db["subscriptions"]
+    subscriptions_collection = async_user_db["subscriptions"]
     
     # Convert Stripe timestamp to datetime
     period_end = datetime.fromtimestamp(subscription.get('cancel_at'))
@@ -436,7 +456,10 @@ async def handle_subscription_updated(subscription):
     
     # Update status based on Stripe status
     if period_end:
-        subscriptions_collection.update_one(
+        subscription_doc = await subscriptions_collection.find_one_and_update(
             {"stripe_subscription_id": subscription_id},
-            {"$set": update_data}
-        ) 
\ No newline at end of file
+            {"$set": update_data},
+            projection={"user_id": 1}
+        )
+        if subscription_doc:
+            invalidate_entitlement(subscription_doc["user_id"]) 
\ No newline at end of file
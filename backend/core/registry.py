@@ -0,0 +1,105 @@
+import time
+import logging
+import threading
+from typing import Dict, Optional, Set
+from pydantic import BaseModel
+from core.config import settings
+from core.database import listings_collection, listing_cards_collection
+from core.data_version import get_data_version
+
+logger = logging.getLogger(__name__)
+
+# Display metadata for the sites the crawlers scrape
+KNOWN_SOURCES = {
+    "sumai": {"name": "Akiya Sumai", "url": "https://akiya.sumai.biz"},
+    "nifty": {"name": "@nifty Real Estate", "url": "https://myhome.nifty.com"},
+    "hatomark": {"name": "Hatomark Site", "url": "https://www.hatomarksite.com"},
+}
+
+
+class SourceInfo(BaseModel):
+    source: str
+    name: str
+    url: Optional[str] = None
+    listing_count: int
+
+
+class SourceRegistry:
+    """
+    Known listing sources and the collection that holds them.
+
+    The source names are read from the indexed source field of listing_cards once
+    and reloaded every SOURCE_REGISTRY_REFRESH_SECONDS, so request handlers never
+    need their own discovery query. Listing counts are only needed by /sources;
+    they are counted on first use and kept until the data version changes.
+    """
+
+    def __init__(self, collection, cards_collection, refresh_seconds: float):
+        self.collection = collection
+        self.cards_collection = cards_collection
+        self.refresh_seconds = refresh_seconds
+        self._names: Set[str] = set()
+        self._loaded_at = None
+        self._counts: Dict[str, int] = {}
+        self._counts_version = None
+        self._lock = threading.Lock()
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def refresh(self):
+        # Served by the source_createdAt_id index without reading any documents
+        names = {source for source in self.cards_collection.distinct("source") if source}
+        self._names = names
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded listing sources: {', '.join(sorted(names))}")
+
+    def _ensure_loaded(self):
+        if not self._is_stale():
+            return
+        with self._lock:
+            if self._is_stale():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep serving the last known sources if the refresh fails
+                    if self._loaded_at is None:
+                        raise
+                    logger.error(f"Failed to refresh listing sources: {e}")
+                    self._loaded_at = time.monotonic()
+
+    def _listing_counts(self, names) -> Dict[str, int]:
+        version = get_data_version()
+        if self._counts_version == version and set(self._counts) == names:
+            return self._counts
+        with self._lock:
+            if self._counts_version != version or set(self._counts) != names:
+                self._counts = {
+                    source: self.cards_collection.count_documents({"source": source})
+                    for source in names
+                }
+                self._counts_version = version
+            return self._counts
+
+    @property
+    def sources(self) -> Dict[str, SourceInfo]:
+        self._ensure_loaded()
+        names = self._names
+        counts = self._listing_counts(names)
+        sources = {}
+        for source in names:
+            metadata = KNOWN_SOURCES.get(source, {})
+            sources[source] = SourceInfo(
+                source=source,
+                name=metadata.get("name", source),
+                url=metadata.get("url"),
+                listing_count=counts.get(source, 0),
+            )
+        return sources
+
+    def is_known(self, source: str) -> bool:
+        self._ensure_loaded()
+        return source in self._names
+
+
+source_registry = SourceRegistry(listings_collection, listing_cards_collection, settings.SOURCE_REGISTRY_REFRESH_SECONDS)
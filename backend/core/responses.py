@@ -0,0 +1,28 @@
+from typing import Any
+import orjson
+from bson import Binary, ObjectId
+from fastapi.responses import JSONResponse
+from core.listing_ids import format_listing_id
+
+
+def default(value):
+    """Serialize the BSON types that can appear in listing documents"""
+    if isinstance(value, Binary) and value.subtype in (3, 4):
+        return format_listing_id(value)
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ListingJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    Listing pages are large (up to 100 documents with image lists and long text), so
+    routes return this directly instead of letting FastAPI run the payload through
+    jsonable_encoder first. Mongo returns naive UTC datetimes; OPT_NAIVE_UTC writes
+    them with an explicit +00:00 offset so clients don't read them as local time.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=default, option=orjson.OPT_NAIVE_UTC)
@@ -0,0 +1,41 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one.
+
+    The first caller for a key runs the function; callers that arrive while it is
+    still running wait for it and get the same result (or exception). Once the call
+    finishes the key is forgotten, so later calls run again. Listing endpoints are
+    sync handlers that FastAPI runs in its threadpool, so this coordinates threads.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -1,11 +1,41 @@
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from api.v1 import listings, auth, payments, favorites
+from fastapi.middleware.gzip import GZipMiddleware
+from api.v1 import listings, auth, payments, favorites, stats
 from core.config import settings
+from core.indexes import ensure_indexes
+from core.registry import source_registry
+from core.locations import location_index
+from core.auth import password_pool, get_current_admin_user
+from core.models import User
+from core.http_cache import CachedStaticFiles
 
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Akiya Helper Homes API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.ENSURE_INDEXES_ON_STARTUP:
+        try:
+            ensure_indexes()
+        except Exception as e:
+            # Don't keep the API down because of an index build; run `python -m core.indexes` instead
+            logger.error(f"Failed to ensure indexes: {e}")
+    try:
+        source_registry.refresh()
+    except Exception as e:
+        # The registry loads lazily on first use if the database isn't reachable yet
+        logger.error(f"Failed to load listing sources: {e}")
+    try:
+        location_index.refresh()
+    except Exception as e:
+        logger.error(f"Failed to load locations: {e}")
+    yield
+
+
+app = FastAPI(title="Akiya Helper Homes API", version="1.0.0", lifespan=lifespan)
 
 # CORS settings
 environment = settings.ENVIRONMENT
@@ -27,15 +57,37 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Listing pages are large and repetitive JSON; compress anything above the threshold
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.GZIP_MINIMUM_SIZE,
+    compresslevel=settings.GZIP_COMPRESS_LEVEL,
+)
+
 # Mount static files for images
-app.mount("/images", StaticFiles(directory="images"), name="images")
+app.mount(
+    "/images",
+    CachedStaticFiles(directory="images", cache_control=settings.IMAGES_CACHE_CONTROL),
+    name="images",
+)
 
 # Include routers with version prefix
 app.include_router(listings.router, prefix="/v1/listings", tags=["listings"])
 app.include_router(auth.router, prefix="/v1/auth", tags=["authentication"])
 app.include_router(payments.router, prefix="/v1/payments", tags=["payments"])
 app.include_router(favorites.router, prefix="/v1/favorites", tags=["favorites"])
+app.include_router(stats.router, prefix="/v1/stats", tags=["stats"])
 
 @app.get("/")
 async def root():
-    return {"message": "Akiya Helper Homes API", "version": "1.0.0"}
\ No newline at end of file
+    return {"message": "Akiya Helper Homes API", "version": "1.0.0"}
+
+@app.get("/health")
+async def health():
+    """Liveness check"""
+    return {"status": "ok"}
+
+@app.get("/health/password-pool")
+async def password_pool_health(current_user: User = Depends(get_current_admin_user)):
+    """Password hashing pool metrics for the worker that answers - admin only"""
+    return password_pool.stats()
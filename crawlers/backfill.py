@@ -0,0 +1,281 @@
+"""
+Backfill the typed listing fields (price_yen, building_area_sqm, land_area_sqm,
+construction_year) on documents that were inserted before the crawlers computed
+them at ingest time, and rebuild their listing_cards summaries.
+
+Each collection is streamed in _id order and split into batches that are
+processed by a pool of worker processes. Every worker derives the fields with the
+same code the crawlers use and writes them back with a single bulk_write per
+batch. The last fully written _id is saved to a checkpoint file so an interrupted
+run can be resumed.
+
+Usage:
+    python backfill.py
+    python backfill.py --collections listings --workers 8 --batch-size 1000
+    python backfill.py --resume
+"""
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import datetime
+import pymongo
+from bson import json_util
+from pymongo import UpdateOne, ReplaceOne
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from config import settings
+from helpers import setup_logger
+from normalize import derive_listing_fields
+from storage import LISTINGS_COLLECTION, LISTING_CARDS_COLLECTION, CARD_FIELDS, build_listing_card, get_db, bump_data_version
+from locations import rebuild_locations
+
+DEFAULT_BATCH_SIZE = 500
+MAX_MISMATCH_SAMPLES = 20
+
+SOURCE_FIELDS = {
+    "Sale Price Yen": 1,
+    "Building - Area": 1,
+    "Land - Area": 1,
+    "Building - Construction Date": 1,
+    "Property Location": 1,
+    # Needed to rebuild the listing cards; only the first image goes on a card
+    **{field: 1 for field in CARD_FIELDS},
+    "images": {"$slice": 1},
+}
+
+# Regexes used by the listings aggregation before the fields were stored
+LEGACY_NUMBER_PATTERN = re.compile(r"([0-9]+(?:\.[0-9]+)?)")
+LEGACY_YEAR_PATTERN = re.compile(r"(\d{4})")
+LEGACY_YEARS_AGO_PATTERN = re.compile(r"(\d+)\s*years?")
+
+logger = setup_logger('backfill', 'backfill')
+logger.addHandler(logging.StreamHandler())
+
+# Per-process database connection, created by init_worker
+worker_db = None
+
+
+def init_worker():
+    global worker_db
+    worker_db = get_db()
+
+
+def legacy_area(text):
+    """Area as the old $regexFind/$toDouble aggregation computed it"""
+    match = LEGACY_NUMBER_PATTERN.search(text or "")
+    return float(match.group(1)) if match else None
+
+
+def legacy_year(text, current_year):
+    """Construction year as the old aggregation computed it"""
+    if not text:
+        return None
+    match = LEGACY_YEAR_PATTERN.search(text)
+    if match:
+        return int(match.group(1))
+    match = LEGACY_YEARS_AGO_PATTERN.search(text)
+    if match:
+        return current_year - int(match.group(1))
+    return None
+
+
+def find_mismatches(doc, derived, current_year):
+    """Compare the derived fields with the old aggregation's results"""
+    legacy = {
+        "building_area_sqm": legacy_area(doc.get("Building - Area")),
+        "land_area_sqm": legacy_area(doc.get("Land - Area")),
+        "construction_year": legacy_year(doc.get("Building - Construction Date"), current_year),
+    }
+
+    mismatches = []
+    for field, old_value in legacy.items():
+        new_value = derived[field]
+        if old_value is None and new_value is None:
+            continue
+        if old_value is None or new_value is None or abs(old_value - new_value) > 0.01:
+            mismatches.append((field, old_value, new_value))
+    return mismatches
+
+
+def process_batch(collection_name, docs, dry_run=False):
+    """Derive and write the typed fields for one batch. Runs in a worker process."""
+    current_year = datetime.datetime.now(datetime.timezone.utc).year
+    operations = []
+    card_operations = []
+    mismatch_counts = {}
+    samples = []
+
+    for doc in docs:
+        derived = derive_listing_fields(doc, current_year)
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": derived}))
+        if collection_name == LISTINGS_COLLECTION:
+            card = build_listing_card({**doc, **derived})
+            card_operations.append(ReplaceOne({"_id": doc["_id"]}, card, upsert=True))
+
+        for field, old_value, new_value in find_mismatches(doc, derived, current_year):
+            mismatch_counts[field] = mismatch_counts.get(field, 0) + 1
+            if len(samples) < MAX_MISMATCH_SAMPLES:
+                samples.append({
+                    "_id": json_util.dumps(doc["_id"]),
+                    "field": field,
+                    "legacy": old_value,
+                    "derived": new_value,
+                })
+
+    modified = 0
+    if operations and not dry_run:
+        result = worker_db[collection_name].bulk_write(operations, ordered=False)
+        modified = result.modified_count
+        if card_operations:
+            result = worker_db[LISTING_CARDS_COLLECTION].bulk_write(card_operations, ordered=False)
+            modified += result.modified_count + result.upserted_count
+
+    return len(docs), modified, mismatch_counts, samples
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json_util.loads(f.read())
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(json_util.dumps(checkpoint))
+    os.replace(tmp_path, path)
+
+
+def backfill_collection(executor, db, collection_name, args, checkpoint):
+    """Stream one collection through the worker pool, checkpointing as batches finish"""
+    query = {}
+    start_after = checkpoint.get(collection_name) if args.resume else None
+    if start_after is not None:
+        query["_id"] = {"$gt": start_after}
+        logger.info(f"Resuming {collection_name} after _id {json_util.dumps(start_after)}")
+
+    total = db[collection_name].count_documents(query)
+    logger.info(f"Backfilling {total} documents in {collection_name}")
+
+    cursor = db[collection_name].find(query, SOURCE_FIELDS).sort("_id", pymongo.ASCENDING).batch_size(args.batch_size)
+    max_in_flight = args.workers * 2
+
+    # Batches can finish out of order; only checkpoint up to the last contiguous one
+    in_flight = {}
+    last_ids = {}
+    finished = set()
+    next_to_checkpoint = 0
+    batch_number = 0
+
+    processed = 0
+    modified = 0
+    mismatch_counts = {}
+    samples = []
+    start_time = time.time()
+
+    def collect(done):
+        nonlocal processed, modified, next_to_checkpoint
+        for future in done:
+            number = in_flight.pop(future)
+            count, batch_modified, batch_mismatches, batch_samples = future.result()
+            processed += count
+            modified += batch_modified
+            for field, field_count in batch_mismatches.items():
+                mismatch_counts[field] = mismatch_counts.get(field, 0) + field_count
+            samples.extend(batch_samples[:MAX_MISMATCH_SAMPLES - len(samples)])
+            finished.add(number)
+
+        while next_to_checkpoint in finished:
+            finished.discard(next_to_checkpoint)
+            checkpoint[collection_name] = last_ids.pop(next_to_checkpoint)
+            next_to_checkpoint += 1
+        if not args.dry_run:
+            save_checkpoint(args.checkpoint_file, checkpoint)
+
+        elapsed = time.time() - start_time
+        rate = processed / elapsed if elapsed > 0 else 0
+        logger.info(f"{collection_name}: {processed}/{total} documents ({rate:.0f} docs/second)")
+
+    def submit(batch):
+        nonlocal batch_number
+        if len(in_flight) >= max_in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+        future = executor.submit(process_batch, collection_name, batch, args.dry_run)
+        in_flight[future] = batch_number
+        last_ids[batch_number] = batch[-1]["_id"]
+        batch_number += 1
+
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= args.batch_size:
+            submit(batch)
+            batch = []
+    if batch:
+        submit(batch)
+
+    if in_flight:
+        done, _ = wait(in_flight)
+        collect(done)
+
+    elapsed = time.time() - start_time
+    rate = processed / elapsed if elapsed > 0 else 0
+    logger.info(f"Finished {collection_name}: {processed} documents, {modified} modified "
+                f"in {elapsed:.2f} seconds ({rate:.0f} docs/second)")
+    if mismatch_counts:
+        logger.warning(f"Mismatches with the old aggregation in {collection_name}: {json.dumps(mismatch_counts)}")
+        for sample in samples:
+            logger.warning(f"  {json.dumps(sample, ensure_ascii=False)}")
+
+    return processed, modified
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill typed listing fields on existing documents")
+    parser.add_argument("--collections", nargs="+", default=[LISTINGS_COLLECTION],
+                        help="Collections to backfill")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Documents per bulk_write")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue after the last checkpointed _id of each collection")
+    parser.add_argument("--checkpoint-file", default=os.path.join(settings.LOG_DIR, "backfill_checkpoint.json"),
+                        help="Where to store the last written _id per collection")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Compute fields and report mismatches without writing")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    db = get_db()
+    checkpoint = load_checkpoint(args.checkpoint_file) if args.resume else {}
+
+    start_time = time.time()
+    total_processed = 0
+    total_modified = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as executor:
+        for collection_name in args.collections:
+            processed, modified = backfill_collection(executor, db, collection_name, args, checkpoint)
+            total_processed += processed
+            total_modified += modified
+
+    if total_modified:
+        if LISTINGS_COLLECTION in args.collections:
+            rebuild_locations(db)
+        bump_data_version(db)
+
+    total_time = time.time() - start_time
+    rate = total_processed / total_time if total_time > 0 else 0
+    logger.info(f"Backfill complete: {total_processed} documents, {total_modified} modified "
+                f"in {total_time:.2f} seconds ({rate:.0f} docs/second)")
+
+
+if __name__ == "__main__":
+    main()
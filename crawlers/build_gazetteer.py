@@ -0,0 +1,250 @@
+"""
+Build gazetteer/municipalities.csv from Japan Post's address list and GeoNames.
+
+The municipalities themselves come from Japan Post's utf_ken_all.csv (every address
+row carries its JIS X 0402 municipality code, kanji name and katakana reading), so
+the list is exactly Japan's cities, towns, villages and Tokyo's special wards.
+Wards of designated cities are folded into their city, which is how addresses name
+them ("Chuo Ward, Sapporo City" is geocoded as Sapporo City). Names are romanized
+from the katakana reading.
+
+Coordinates come from GeoNames cities500.txt (CC BY 4.0): the most populous place
+in the same prefecture named with the municipality's kanji, or failing that its
+romanized name, never reusing a place another municipality matched. Municipalities
+with no such place are left out and fall back to their prefecture.
+
+Download utf_ken_all.zip from https://www.post.japanpost.jp/zipcode/download.html
+and cities500.zip from https://download.geonames.org/export/dump/, unzip both, then:
+
+Usage:
+    python build_gazetteer.py utf_ken_all.csv cities500.txt
+"""
+import re
+import csv
+import argparse
+from geocode import MUNICIPALITY_GAZETTEER, PREFECTURE_GAZETTEER, municipality_key
+
+# GeoNames admin1 codes for Japan (alphabetical, not the JIS prefecture order)
+GEONAMES_PREFECTURES = {
+    "01": "aichi", "02": "akita", "03": "aomori", "04": "chiba", "05": "ehime",
+    "06": "fukui", "07": "fukuoka", "08": "fukushima", "09": "gifu", "10": "gunma",
+    "11": "hiroshima", "12": "hokkaido", "13": "hyogo", "14": "ibaraki", "15": "ishikawa",
+    "16": "iwate", "17": "kagawa", "18": "kagoshima", "19": "kanagawa", "20": "kochi",
+    "21": "kumamoto", "22": "kyoto", "23": "mie", "24": "miyagi", "25": "miyazaki",
+    "26": "nagano", "27": "nagasaki", "28": "nara", "29": "niigata", "30": "oita",
+    "31": "okayama", "32": "osaka", "33": "saga", "34": "saitama", "35": "shiga",
+    "36": "shimane", "37": "shizuoka", "38": "tochigi", "39": "tokushima", "40": "tokyo",
+    "41": "tottori", "42": "toyama", "43": "wakayama", "44": "yamagata", "45": "yamaguchi",
+    "46": "yamanashi", "47": "okinawa",
+}
+
+# Kanji suffix -> (kind, katakana readings of the suffix)
+KINDS = {
+    "市": ("City", ("シ",)),
+    "区": ("Ward", ("ク",)),
+    "町": ("Town", ("チョウ", "マチ")),
+    "村": ("Village", ("ムラ", "ソン")),
+}
+# Prefecture suffix readings (県, 府, 都); 北海道 keeps its 道
+PREFECTURE_SUFFIXES = ("ken", "fu", "to")
+
+KANA = {
+    "ア": "a", "イ": "i", "ウ": "u", "エ": "e", "オ": "o",
+    "カ": "ka", "キ": "ki", "ク": "ku", "ケ": "ke", "コ": "ko",
+    "ガ": "ga", "ギ": "gi", "グ": "gu", "ゲ": "ge", "ゴ": "go",
+    "サ": "sa", "シ": "shi", "ス": "su", "セ": "se", "ソ": "so",
+    "ザ": "za", "ジ": "ji", "ズ": "zu", "ゼ": "ze", "ゾ": "zo",
+    "タ": "ta", "チ": "chi", "ツ": "tsu", "テ": "te", "ト": "to",
+    "ダ": "da", "ヂ": "ji", "ヅ": "zu", "デ": "de", "ド": "do",
+    "ナ": "na", "ニ": "ni", "ヌ": "nu", "ネ": "ne", "ノ": "no",
+    "ハ": "ha", "ヒ": "hi", "フ": "fu", "ヘ": "he", "ホ": "ho",
+    "バ": "ba", "ビ": "bi", "ブ": "bu", "ベ": "be", "ボ": "bo",
+    "パ": "pa", "ピ": "pi", "プ": "pu", "ペ": "pe", "ポ": "po",
+    "マ": "ma", "ミ": "mi", "ム": "mu", "メ": "me", "モ": "mo",
+    "ヤ": "ya", "ユ": "yu", "ヨ": "yo",
+    "ラ": "ra", "リ": "ri", "ル": "ru", "レ": "re", "ロ": "ro",
+    "ワ": "wa", "ヰ": "i", "ヱ": "e", "ヲ": "o", "ン": "n", "ヴ": "vu",
+    "ァ": "a", "ィ": "i", "ゥ": "u", "ェ": "e", "ォ": "o",
+}
+SMALL_Y = {"ャ": "a", "ュ": "u", "ョ": "o"}
+# Long vowels are written plainly, as in "Tokyo" and "Osaka"
+LONG_VOWELS = re.compile(r"(?<=o)[ou]|(?<=u)u")
+
+
+def romanize(katakana):
+    """Hepburn romanization of a katakana reading, without long-vowel marks"""
+    syllables = []
+    for ch in katakana:
+        if ch in SMALL_Y and syllables:
+            previous = syllables.pop()
+            if previous in ("shi", "chi", "ji"):
+                syllables.append(previous[:-1] + SMALL_Y[ch])
+            else:
+                syllables.append(previous[:-1] + "y" + SMALL_Y[ch])
+        elif ch in KANA:
+            syllables.append(KANA[ch])
+        elif ch in ("ッ", "ー"):
+            syllables.append(ch)
+        else:
+            raise ValueError(f"Unexpected character {ch!r} in {katakana}")
+
+    text = ""
+    for i, syllable in enumerate(syllables):
+        if syllable == "ー":
+            continue
+        if syllable == "ッ":
+            following = next((s for s in syllables[i + 1:] if s not in ("ッ", "ー")), "")
+            text += "t" if following.startswith("ch") else following[:1]
+            continue
+        text += syllable
+    return LONG_VOWELS.sub("", text)
+
+
+def strip_reading(kana, suffixes):
+    for suffix in suffixes:
+        if kana.endswith(suffix):
+            return kana[:-len(suffix)]
+    raise ValueError(f"{kana} doesn't end in any of {suffixes}")
+
+
+def read_municipalities(path):
+    """
+    Municipalities in Japan Post's utf_ken_all.csv as
+    (prefecture, kanji name, romanized name without kind, kind)
+    """
+    cities = {}
+    for row in csv.reader(open(path, encoding="utf-8")):
+        cities[row[0]] = (row[3], row[4], row[6], row[7])
+
+    municipalities = {}
+    wards = {}
+    for prefecture_kana, city_kana, prefecture, city in cities.values():
+        prefecture = romanize(prefecture_kana)
+        for suffix in PREFECTURE_SUFFIXES:
+            if prefecture != "hokkaido" and prefecture.endswith(suffix):
+                prefecture = prefecture[:-len(suffix)]
+                break
+
+        if city.endswith("区") and "市" in city:
+            # Ward of a designated city; the city is recovered from all its wards below
+            wards.setdefault((prefecture, city[:city.index("市") + 1]), []).append(city_kana)
+            continue
+        if "郡" in city[:-1] and city[-1] in "町村":
+            # "Abuta District, Toyako Town": addresses name the town on its own
+            city = city[city.index("郡") + 1:]
+            city_kana = city_kana[city_kana.index("グン") + 2:]
+        if prefecture == "tokyo" and "島" in city[:-2]:
+            # Two island municipalities are prefixed with their island ("三宅島三宅村")
+            city = city[city.index("島") + 1:]
+            city_kana = city_kana[city_kana.index("ジマ") + 2:]
+
+        kind, readings = KINDS[city[-1]]
+        municipalities[(prefecture, city)] = (romanize(strip_reading(city_kana, readings)), kind)
+
+    for (prefecture, city), readings in wards.items():
+        # The wards' readings share the city's reading ("サッポロシ" + ward)
+        common = readings[0]
+        for reading in readings[1:]:
+            while not reading.startswith(common):
+                common = common[:-1]
+        common = common[:common.rindex("シ") + 1]
+        municipalities[(prefecture, city)] = (romanize(strip_reading(common, ("シ",))), "City")
+
+    return [(prefecture, city, name, kind) for (prefecture, city), (name, kind) in municipalities.items()]
+
+
+def read_geonames(path):
+    """Japanese populated places from a GeoNames dump (tab-separated, no header)"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            columns = line.rstrip("\n").split("\t")
+            if columns[8] != "JP" or columns[6] != "P":
+                continue
+            yield {
+                "geonameid": columns[0],
+                "name": columns[2] or columns[1],
+                "alternatenames": columns[3].split(",") if columns[3] else [],
+                "latitude": float(columns[4]),
+                "longitude": float(columns[5]),
+                "admin1": columns[10],
+                "population": int(columns[14] or 0),
+            }
+
+
+def build_rows(municipalities, places):
+    """One (prefecture, municipality, latitude, longitude) row per municipality GeoNames can place"""
+    by_kanji = {}
+    by_key = {}
+    for place in places:
+        prefecture = GEONAMES_PREFECTURES.get(place["admin1"])
+        if not prefecture:
+            continue
+        by_key.setdefault((prefecture, municipality_key(place["name"])), []).append(place)
+        for name in place["alternatenames"]:
+            name = name.strip().replace("　", "")
+            if name and not name.isascii():
+                by_kanji.setdefault((prefecture, name), []).append(place)
+
+    # Exact kanji names first, so a town sharing a city's name ("釧路町" and "釧路市")
+    # can't take the city's place through the looser matches
+    placed = {}
+    for municipality in municipalities:
+        prefecture, city, name, kind = municipality
+        if (prefecture, city) in by_kanji:
+            placed[municipality] = max(by_kanji[(prefecture, city)], key=lambda p: p["population"])
+    used = {place["geonameid"] for place in placed.values()}
+
+    rows = []
+    missing = []
+    for municipality in municipalities:
+        prefecture, city, name, kind = municipality
+        place = placed.get(municipality)
+        if not place:
+            stem = city[:-1]
+            candidates = [p for p in ((len(stem) > 1 and by_kanji.get((prefecture, stem)))
+                                      or by_key.get((prefecture, municipality_key(name))) or [])
+                          if p["geonameid"] not in used]
+            if not candidates:
+                missing.append(f"{prefecture} {city}")
+                continue
+            place = max(candidates, key=lambda p: p["population"])
+            used.add(place["geonameid"])
+        rows.append({
+            "prefecture": prefecture,
+            "municipality": f"{name.capitalize()} {kind}",
+            "latitude": round(place["latitude"], 5),
+            "longitude": round(place["longitude"], 5),
+        })
+    rows.sort(key=lambda row: (row["prefecture"], row["municipality"]))
+    return rows, missing
+
+
+def write_rows(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["prefecture", "municipality", "latitude", "longitude"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the bundled municipality gazetteer")
+    parser.add_argument("ken_all_file", help="Japan Post utf_ken_all.csv")
+    parser.add_argument("geonames_file", help="GeoNames cities500.txt")
+    parser.add_argument("--output", default=MUNICIPALITY_GAZETTEER)
+    args = parser.parse_args()
+
+    municipalities = read_municipalities(args.ken_all_file)
+    known_prefectures = {row["prefecture"] for row in csv.DictReader(open(PREFECTURE_GAZETTEER, encoding="utf-8"))}
+    unknown = {prefecture for prefecture, *_ in municipalities} - known_prefectures
+    if unknown:
+        raise SystemExit(f"Romanized prefectures not in {PREFECTURE_GAZETTEER}: {sorted(unknown)}")
+
+    rows, missing = build_rows(municipalities, read_geonames(args.geonames_file))
+    write_rows(rows, args.output)
+    print(f"Wrote {len(rows)} of {len(municipalities)} municipalities to {args.output}")
+    if missing:
+        print(f"No GeoNames place for {len(missing)}: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
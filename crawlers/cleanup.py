@@ -1,63 +1,159 @@
 import os
+import datetime
 import requests
 import pymongo
-import urllib.parse
+from pymongo import ReplaceOne
 from config import settings
 from helpers import setup_logger, check_delete_link
+from storage import LISTINGS_COLLECTION, LISTING_CARDS_COLLECTION, get_db, bump_data_version
+from derived import refresh_derived_collections
+from locations import update_location_counts
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # set up logger
 logger = setup_logger('cleanup', 'cleanup')
 
 # DB config
-user = urllib.parse.quote_plus(settings.DB_USER)
-password = urllib.parse.quote_plus(settings.DB_PASSWORD)
-client = pymongo.MongoClient(f"mongodb://{user}:{password}@{settings.DB_HOST}:{settings.DB_PORT}")
-db = client.crawler_data
+db = get_db()
 
 # Settings
 BASE_IMAGE_PATH = "/home/admin/japanese-real-estate-scraping/crawlers"
 MAX_WORKERS = 20  # Tune this based on your system and network capacity
+ARCHIVE_BATCH_SIZE = 500
+
+ARCHIVE_COLLECTION = "archived_listings"
+
+# Only the fields needed for price and time-on-market analytics are archived
+ARCHIVE_FIELDS = [
+    "link",
+    "Prefecture",
+    "Property Type",
+    "Property Location",
+    "Sale Price",
+    "Sale Price Yen",
+    "Building - Area",
+    "Land - Area",
+    "Building - Layout",
+    "Building - Construction Date",
+    "municipality",
+    "source",
+    "createdAt",
+]
 
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
 }
 
-def process_document(collection_name, doc):
-    collection = db[collection_name]
+
+def ensure_archive_indexes():
+    """Create the TTL index that expires archived listings for good"""
+    archive = db[ARCHIVE_COLLECTION]
+    archive.create_index(
+        "delistedAt",
+        name="delistedAt_ttl",
+        expireAfterSeconds=settings.ARCHIVE_TTL_DAYS * 24 * 60 * 60,
+    )
+    archive.create_index([("Prefecture", pymongo.ASCENDING), ("delistedAt", pymongo.DESCENDING)])
+
+
+def build_archive_record(doc, delisted_at):
+    """Build the compact archive document for a delisted listing"""
+    record = {field: doc.get(field) for field in ARCHIVE_FIELDS}
+    record["_id"] = doc["_id"]
+    record["delistedAt"] = delisted_at
+
+    created_at = doc.get("createdAt")
+    if created_at:
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+        record["days_on_market"] = (delisted_at - created_at).days
+
+    return record
+
+
+def archive_documents(docs):
+    """Move delisted listings into the archive collection in bulk"""
+    collection = db[LISTINGS_COLLECTION]
+    archive = db[ARCHIVE_COLLECTION]
+    delisted_at = datetime.datetime.now(datetime.timezone.utc)
+
+    for start in range(0, len(docs), ARCHIVE_BATCH_SIZE):
+        batch = docs[start:start + ARCHIVE_BATCH_SIZE]
+
+        # Upsert by _id so re-running after a partial failure is safe
+        archive.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, build_archive_record(doc, delisted_at), upsert=True)
+             for doc in batch],
+            ordered=False,
+        )
+        ids = [doc["_id"] for doc in batch]
+        db[LISTING_CARDS_COLLECTION].delete_many({"_id": {"$in": ids}})
+        result = collection.delete_many({"_id": {"$in": ids}})
+        update_location_counts(db, batch, -1)
+        logger.info(f"Archived {result.deleted_count} listings")
+
+        # The images go only after their listings are archived and no longer served
+        for doc in batch:
+            delete_images(doc)
+
+    bump_data_version(db)
+
+
+def delete_images(doc):
+    """Delete a listing's image files. Only called once the listing has been archived."""
+    for relative_path in doc.get("images", []):
+        abs_path = os.path.join(BASE_IMAGE_PATH, relative_path)
+        try:
+            if os.path.exists(abs_path):
+                os.remove(abs_path)
+                logger.info(f"  Deleted image: {abs_path}")
+            else:
+                logger.info(f"  Image not found: {abs_path}")
+        except Exception as e:
+            logger.error(f"  Error deleting {abs_path}: {e}")
+
+
+def process_document(doc):
+    """Check a listing. Returns the doc if it is gone and should be archived."""
     link = doc.get("link")
-    images = doc.get("images", [])
 
     if not link:
-        return
+        return None
 
     try:
         if check_delete_link(link, logger):
-            logger.info(f"Deleting document with link {link}")
-
-            for relative_path in images:
-                abs_path = os.path.join(BASE_IMAGE_PATH, relative_path)
-                try:
-                    if os.path.exists(abs_path):
-                        os.remove(abs_path)
-                        logger.info(f"  Deleted image: {abs_path}")
-                    else:
-                        logger.info(f"  Image not found: {abs_path}")
-                except Exception as e:
-                    logger.error(f"  Error deleting {abs_path}: {e}")
-
-            collection.delete_one({"_id": doc["_id"]})
+            logger.info(f"Archiving document with link {link}")
+            return doc
     except requests.RequestException as e:
         logger.error(f"Skipping {link} due to request error: {e}")
+    except Exception as e:
+        # e.g. an unexpected Zyte response; skip the listing rather than end the run
+        logger.error(f"Skipping {link} due to unexpected error: {e}")
+
+    return None
+
+
+ensure_archive_indexes()
+
+# Check listings in parallel
+projection = {field: 1 for field in ARCHIVE_FIELDS}
+projection["images"] = 1
+
+logger.info(f"Checking collection: {LISTINGS_COLLECTION}")
+docs = list(db[LISTINGS_COLLECTION].find({}, projection))
+delisted = []
+
+with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    futures = [executor.submit(process_document, doc) for doc in docs]
+    for future in as_completed(futures):
+        try:
+            doc = future.result()
+        except Exception as e:
+            logger.error(f"Error checking listing: {e}")
+            continue
+        if doc is not None:
+            delisted.append(doc)
 
-# Process collections in parallel
-for collection_name in db.list_collection_names():
-    collection = db[collection_name]
-    logger.info(f"Checking collection: {collection_name}")
-
-    docs = list(collection.find({}, {"link": 1, "images": 1}))
-    
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_document, collection_name, doc) for doc in docs]
-        for future in as_completed(futures):
-            pass  # We don't need the result, just want to wait for completion
+if delisted:
+    archive_documents(delisted)
+    refresh_derived_collections(db, {doc["Prefecture"] for doc in delisted if doc.get("Prefecture")})
@@ -11,6 +11,10 @@ class Settings(BaseSettings):
     LOG_DIR: str
     ZYTE_API_KEY: str = ""
     ENV: str = "prod"
+    ARCHIVE_TTL_DAYS: int = 730
+    # Optional municipality gazetteer CSV (prefecture,municipality,latitude,longitude)
+    # whose rows override the bundled gazetteer/municipalities.csv
+    GAZETTEER_PATH: str = ""
 
     class Config:
         env_file = ".env"
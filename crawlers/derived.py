@@ -0,0 +1,22 @@
+"""
+Refresh the collections derived from listings (market statistics) after a crawl
+or cleanup run, limited to the prefectures whose listings changed.
+"""
+from storage import changed_prefectures, publish_inserts
+from market_stats import refresh_market_stats
+
+
+def refresh_derived_collections(db, prefectures=None):
+    """
+    Bring the materialized collections up to date. Defaults to the prefectures this
+    process inserted listings into. Called at the end of each crawl, so this is also
+    where the crawl's inserts are published to the API with one data version bump.
+    """
+    if prefectures is None:
+        prefectures = set(changed_prefectures)
+        changed_prefectures.clear()
+    try:
+        if prefectures:
+            refresh_market_stats(db, prefectures)
+    finally:
+        publish_inserts(db)
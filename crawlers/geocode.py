@@ -0,0 +1,121 @@
+"""
+Offline geocoding of listings against bundled gazetteers, with no external service.
+
+Two gazetteers ship with the crawlers:
+- gazetteer/municipalities.csv: one point per municipality (its main populated
+  place), built from Japan Post's municipality list and GeoNames by build_gazetteer.py
+- gazetteer/prefectures.csv: one point per prefecture (the prefectural government
+  office), used when a listing's municipality isn't found
+
+A finer or corrected gazetteer with the same prefecture,municipality,latitude,longitude
+columns can be supplied through the GAZETTEER_PATH setting; its rows take precedence.
+Municipality names may be written "Kitami City" or "Kitami-shi", and romanization
+variants ("Ōtsu", "Ohtsu", "Otsu") match each other. The kind tells apart
+municipalities sharing a name ("Kushiro City" and "Kushiro Town"); a gazetteer row
+without one ("Kitami") matches any kind. Each listing gets the most precise point
+available, and geo_precision records which one it was, so prefecture fallbacks can
+be kept out of radius and viewport searches.
+"""
+import os
+import re
+import csv
+import logging
+import unicodedata
+from functools import lru_cache
+from config import settings
+
+GAZETTEER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer")
+PREFECTURE_GAZETTEER = os.path.join(GAZETTEER_DIR, "prefectures.csv")
+MUNICIPALITY_GAZETTEER = os.path.join(GAZETTEER_DIR, "municipalities.csv")
+
+PRECISION_MUNICIPALITY = "municipality"
+PRECISION_PREFECTURE = "prefecture"
+
+# Long vowels are romanized as "ō", "ou", "oo", "oh" or a doubled vowel; fold them
+# all to the single vowel
+LONG_VOWEL_PATTERN = re.compile(r"(?<=o)(?:o|u|h(?![aiueoy]))|(?<=u)u|(?<=i)i|(?<=a)a")
+KIND_SUFFIX_PATTERN = re.compile(r"[ -](city|ward|town|village|shi|ku|machi|cho|chō|mura|son)$", re.IGNORECASE)
+MUNICIPALITY_KINDS = {
+    "city": "City", "shi": "City",
+    "ward": "Ward", "ku": "Ward",
+    "town": "Town", "machi": "Town", "cho": "Town", "chō": "Town",
+    "village": "Village", "mura": "Village", "son": "Village",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def prefecture_key(prefecture):
+    key = prefecture.strip().lower()
+    return key.removesuffix(" prefecture").removesuffix("-ken").strip()
+
+
+def municipality_key(name):
+    """
+    Lookup key for a municipality name: the name without its kind, folded to plain
+    lowercase letters with long vowels shortened ("Ōtsu City" and "Ohtsu-shi" give "otsu")
+    """
+    name = KIND_SUFFIX_PATTERN.sub("", name.strip())
+    decomposed = unicodedata.normalize("NFKD", name)
+    letters = "".join(ch for ch in decomposed if "a" <= ch.lower() <= "z").lower()
+    return LONG_VOWEL_PATTERN.sub("", letters)
+
+
+def municipality_kind(name):
+    """City, Ward, Town or Village from a municipality name's suffix, or None without one"""
+    match = KIND_SUFFIX_PATTERN.search(name.strip())
+    return MUNICIPALITY_KINDS[match.group(1).lower()] if match else None
+
+
+def point(latitude, longitude):
+    """GeoJSON point; GeoJSON puts longitude first"""
+    return {"type": "Point", "coordinates": [round(float(longitude), 6), round(float(latitude), 6)]}
+
+
+def read_municipalities(path, municipalities):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            key = (prefecture_key(row["prefecture"]), municipality_key(row["municipality"]))
+            kinds = municipalities.setdefault(key, {})
+            kinds[municipality_kind(row["municipality"])] = point(row["latitude"], row["longitude"])
+
+
+@lru_cache(maxsize=None)
+def load_gazetteer():
+    """
+    Read the gazetteers once per process. Returns (prefecture points, municipality
+    points by kind).
+    """
+    prefectures = {}
+    with open(PREFECTURE_GAZETTEER, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            prefectures[prefecture_key(row["prefecture"])] = point(row["latitude"], row["longitude"])
+
+    municipalities = {}
+    read_municipalities(MUNICIPALITY_GAZETTEER, municipalities)
+    if settings.GAZETTEER_PATH:
+        # Read last so its rows replace the bundled ones
+        read_municipalities(settings.GAZETTEER_PATH, municipalities)
+    logger.info(f"Loaded {len(municipalities)} municipalities")
+
+    return prefectures, municipalities
+
+
+def geocode_location(prefecture, municipality):
+    """
+    GeoJSON location and its precision for a listing's prefecture and parsed
+    municipality. Both are None when the prefecture isn't known.
+    """
+    if not prefecture:
+        return {"location": None, "geo_precision": None}
+
+    prefectures, municipalities = load_gazetteer()
+    key = prefecture_key(prefecture)
+    if municipality:
+        kinds = municipalities.get((key, municipality_key(municipality)), {})
+        location = kinds.get(municipality_kind(municipality)) or kinds.get(None)
+        if location:
+            return {"location": location, "geo_precision": PRECISION_MUNICIPALITY}
+    if key in prefectures:
+        return {"location": prefectures[key], "geo_precision": PRECISION_PREFECTURE}
+    return {"location": None, "geo_precision": None}
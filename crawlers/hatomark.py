@@ -7,6 +7,8 @@ import bson
 from bs4 import BeautifulSoup
 from uuid import uuid4
 from helpers import translate_text, save_image, setup_logger, convert_to_usd, fetch_with_backoff
+from storage import LISTINGS_COLLECTION, insert_listing
+from derived import refresh_derived_collections
 from config import settings
 import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -25,7 +27,7 @@ def get_db_connection():
         password = urllib.parse.quote_plus(settings.DB_PASSWORD)
         thread_local.client = pymongo.MongoClient("mongodb://%s:%s@%s:%s" % (user, password, settings.DB_HOST, settings.DB_PORT))
         thread_local.db = thread_local.client.crawler_data
-        thread_local.collection = thread_local.db.hatomark_collection
+        thread_local.collection = thread_local.db[LISTINGS_COLLECTION]
     return thread_local.collection
 
 # DB config (for backward compatibility)
@@ -33,7 +35,7 @@ user = urllib.parse.quote_plus(settings.DB_USER)
 password = urllib.parse.quote_plus(settings.DB_PASSWORD)
 client = pymongo.MongoClient("mongodb://%s:%s@%s:%s" % (user, password, settings.DB_HOST, settings.DB_PORT))
 db = client.crawler_data
-collection = db.hatomark_collection
+collection = db[LISTINGS_COLLECTION]
 
 # Set up logger
 logger = setup_logger('hatomark', 'hatomark')
@@ -203,7 +205,7 @@ def scrape_page(num, prefecture, page_num):
    
         listing_data["images"] = image_paths
 
-        collection.insert_one(listing_data)
+        insert_listing(collection, listing_data, "hatomark")
 
     return True
 
@@ -230,7 +232,7 @@ def process_prefecture(prefecture_data):
     logger.info(f"Completed processing prefecture: {prefecture} (processed {total_pages} pages)")
     return prefecture, total_pages
 
-def main():
+def crawl():
     prefectures = ["hokkaido", "aomori", "iwate", "miyagi", "akita", "yamagata", "fukushima", "tokyo", "kanagawa",
             "saitama", "chiba", "ibaraki", "tochigi", "gunma", "niigata", "yamanashi", "nagano", "toyama",
             "ishikawa", "fukui", "aichi", "gifu", "shizuoka", "mie", "osaka", "hyogo", "kyoto", "shiga",
@@ -288,5 +290,13 @@ def main():
         pages_per_second = total_pages / total_time
         logger.info(f"Performance: {pages_per_second:.2f} pages/second")
 
+
+def main():
+    try:
+        crawl()
+    finally:
+        # Publish whatever was inserted even if the crawl stopped partway
+        refresh_derived_collections(db)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
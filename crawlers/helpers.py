@@ -3,13 +3,13 @@ import deepl
 import requests
 import os
 import logging
-import re
 import random
 import time
 from config import settings
 from currency_converter import CurrencyConverter
 import logging.handlers
 from base64 import b64decode
+from normalize import extract_yen_amount
 
 MAX_RETRIES = 5
 INITIAL_BACKOFF = 0.5  # in seconds
@@ -178,25 +178,6 @@ def get_area_label(label):
     return japanese_to_english[label]
 
 
-def extract_yen_amount(text):
-    # Remove commas for easier parsing
-    cleaned = text.lower().replace(',', '')
-    
-    match = re.search(r'([\d.]+)\s*(million|thousand)?\s*yen', cleaned)
-    if not match:
-        return None
-    
-    number = float(match.group(1))
-    unit = match.group(2)
-
-    if unit == 'million':
-        number *= 1_000_000
-    elif unit == 'thousand':
-        number *= 1_000
-
-    return int(number)
-
-
 def convert_to_usd(yen_text):
     c = CurrencyConverter()
     yen = extract_yen_amount(yen_text)
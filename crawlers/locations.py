@@ -0,0 +1,81 @@
+"""
+Listing counts per municipality, used by the API's location autocomplete.
+
+The crawlers add to the counts as they insert listings and cleanup subtracts
+the listings it archives, so the locations collection stays current without
+scanning listings. Running this script rebuilds it from the listings collection,
+e.g. after backfill.py has filled in the municipality field.
+
+Usage:
+    python locations.py
+"""
+import logging
+from pymongo import UpdateOne
+from helpers import setup_logger
+
+LOCATIONS_COLLECTION = "locations"
+
+logger = setup_logger('locations', 'locations')
+
+
+def location_id(prefecture, municipality):
+    return f"{prefecture}|{municipality}"
+
+
+def location_counts(docs):
+    """Count listings per (prefecture, municipality), skipping those without a municipality"""
+    counts = {}
+    for doc in docs:
+        if not doc.get("municipality") or not doc.get("Prefecture"):
+            continue
+        key = (doc["Prefecture"], doc["municipality"])
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def update_location_counts(db, docs, direction):
+    """Add (direction=1) or remove (direction=-1) the given listings from the counts"""
+    counts = location_counts(docs)
+    if not counts:
+        return
+
+    operations = [
+        UpdateOne(
+            {"_id": location_id(prefecture, municipality)},
+            {"$inc": {"count": direction * count},
+             "$setOnInsert": {"prefecture": prefecture, "municipality": municipality}},
+            upsert=True,
+        )
+        for (prefecture, municipality), count in counts.items()
+    ]
+    db[LOCATIONS_COLLECTION].bulk_write(operations, ordered=False)
+    if direction < 0:
+        db[LOCATIONS_COLLECTION].delete_many({"count": {"$lte": 0}})
+
+
+def rebuild_locations(db):
+    """Recompute every count from the listings collection"""
+    # storage imports this module for insert_listing, so import it lazily here
+    from storage import LISTINGS_COLLECTION
+    db[LISTINGS_COLLECTION].aggregate([
+        {"$match": {"municipality": {"$type": "string"}, "Prefecture": {"$type": "string"}}},
+        {"$group": {
+            "_id": {"$concat": ["$Prefecture", "|", "$municipality"]},
+            "prefecture": {"$first": "$Prefecture"},
+            "municipality": {"$first": "$municipality"},
+            "count": {"$sum": 1},
+        }},
+        {"$out": LOCATIONS_COLLECTION},
+    ])
+    total = db[LOCATIONS_COLLECTION].count_documents({})
+    logger.info(f"Rebuilt {LOCATIONS_COLLECTION}: {total} municipalities")
+
+
+def main():
+    from storage import get_db
+    logger.addHandler(logging.StreamHandler())
+    rebuild_locations(get_db())
+
+
+if __name__ == "__main__":
+    main()
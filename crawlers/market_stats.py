@@ -0,0 +1,103 @@
+"""
+Materialized market statistics per prefecture and property type.
+
+The stats are computed server-side from the typed listing fields and written to
+the market_stats collection with $merge, so the API reads one small document per
+prefecture/property type instead of aggregating listings on every request. The
+crawlers and cleanup refresh only the prefectures whose listings changed during
+their run; running this script refreshes everything.
+
+Usage:
+    python market_stats.py
+    python market_stats.py --prefectures hokkaido tokyo
+"""
+import logging
+import argparse
+from bson import ObjectId
+from helpers import setup_logger
+from storage import LISTINGS_COLLECTION, get_db
+
+MARKET_STATS_COLLECTION = "market_stats"
+
+# Property type recorded on the per-prefecture rows that cover every type
+ALL_PROPERTY_TYPES = "all"
+
+logger = setup_logger('market_stats', 'market_stats')
+
+PRICE_PER_SQM = {"$cond": [
+    {"$gt": ["$building_area_sqm", 0]},
+    {"$divide": ["$price_yen", "$building_area_sqm"]},
+    None,
+]}
+
+
+def stats_pipeline(match, property_type, refresh_id):
+    """Group the matching listings and merge one stats document per group into market_stats"""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"prefecture": "$Prefecture", "property_type": property_type},
+            "listing_count": {"$sum": 1},
+            # $median and $percentile skip missing and non-numeric values
+            "median_price_yen": {"$median": {"input": "$price_yen", "method": "approximate"}},
+            "price_yen_quartiles": {"$percentile": {"input": "$price_yen", "p": [0.25, 0.75], "method": "approximate"}},
+            "median_price_usd": {"$median": {"input": "$Sale Price", "method": "approximate"}},
+            "median_price_per_sqm_yen": {"$median": {"input": PRICE_PER_SQM, "method": "approximate"}},
+            "median_building_area_sqm": {"$median": {"input": "$building_area_sqm", "method": "approximate"}},
+            "median_land_area_sqm": {"$median": {"input": "$land_area_sqm", "method": "approximate"}},
+            "median_construction_year": {"$median": {"input": "$construction_year", "method": "approximate"}},
+        }},
+        {"$set": {
+            "prefecture": "$_id.prefecture",
+            "property_type": "$_id.property_type",
+            "refresh_id": refresh_id,
+            "updatedAt": "$$NOW",
+        }},
+        {"$merge": {
+            "into": MARKET_STATS_COLLECTION,
+            "on": "_id",
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ]
+
+
+def refresh_market_stats(db, prefectures=None):
+    """
+    Recompute the stats for the given prefectures (all of them if None). Groups
+    that no longer have any listings are removed.
+    """
+    if prefectures is not None and not prefectures:
+        return
+
+    match = {"Prefecture": {"$type": "string"}, "price_yen": {"$type": "number"}}
+    if prefectures is not None:
+        match["Prefecture"] = {"$in": sorted(prefectures)}
+
+    refresh_id = ObjectId()
+    listings = db[LISTINGS_COLLECTION]
+    listings.aggregate(stats_pipeline(match, {"$ifNull": ["$Property Type", "unknown"]}, refresh_id))
+    listings.aggregate(stats_pipeline(match, ALL_PROPERTY_TYPES, refresh_id))
+
+    stale = {"refresh_id": {"$ne": refresh_id}}
+    if prefectures is not None:
+        stale["prefecture"] = {"$in": sorted(prefectures)}
+    removed = db[MARKET_STATS_COLLECTION].delete_many(stale).deleted_count
+
+    scope = ", ".join(sorted(prefectures)) if prefectures is not None else "all prefectures"
+    logger.info(f"Refreshed market stats for {scope} ({removed} empty groups removed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the materialized market statistics")
+    parser.add_argument("--prefectures", nargs="+",
+                        help="Only refresh these prefectures")
+    args = parser.parse_args()
+
+    logger.addHandler(logging.StreamHandler())
+    db = get_db()
+    refresh_market_stats(db, set(args.prefectures) if args.prefectures else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Copy listings from the per-site collections (sumai_collection, nifty_collection,
+hatomark_collection) into the unified listings collection, tagging each document
+with its source. The copy runs server-side with $merge and keeps any document
+that already exists in listings, so it is safe to run more than once.
+Run backfill.py afterwards to compute the typed fields and build listing_cards.
+
+Usage:
+    python migrate_listings.py
+    python migrate_listings.py --drop-legacy   # drop each legacy collection once fully copied
+"""
+import logging
+import argparse
+from helpers import setup_logger
+from storage import LISTINGS_COLLECTION, LEGACY_COLLECTIONS, get_db, bump_data_version
+
+logger = setup_logger('migrate_listings', 'migrate_listings')
+logger.addHandler(logging.StreamHandler())
+
+
+def migrate_collection(db, source, collection_name, drop_legacy=False):
+    legacy = db[collection_name]
+    legacy_count = legacy.count_documents({})
+    logger.info(f"Merging {legacy_count} documents from {collection_name} into {LISTINGS_COLLECTION}")
+
+    legacy.aggregate([
+        {"$addFields": {"source": source}},
+        {"$merge": {
+            "into": LISTINGS_COLLECTION,
+            "on": "_id",
+            "whenMatched": "keepExisting",
+            "whenNotMatched": "insert",
+        }},
+    ])
+
+    merged_count = db[LISTINGS_COLLECTION].count_documents({"source": source})
+    logger.info(f"{LISTINGS_COLLECTION} now holds {merged_count} {source} listings")
+
+    if drop_legacy:
+        if merged_count >= legacy_count:
+            legacy.drop()
+            logger.info(f"Dropped {collection_name}")
+        else:
+            logger.warning(f"Not dropping {collection_name}: only {merged_count} of {legacy_count} documents merged")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge per-site listing collections into the unified listings collection")
+    parser.add_argument("--drop-legacy", action="store_true",
+                        help="Drop each legacy collection after it has been fully merged")
+    args = parser.parse_args()
+
+    db = get_db()
+    existing = set(db.list_collection_names())
+    for source, collection_name in LEGACY_COLLECTIONS.items():
+        if collection_name not in existing:
+            logger.info(f"Skipping {collection_name}: collection does not exist")
+            continue
+        migrate_collection(db, source, collection_name, args.drop_legacy)
+
+    bump_data_version(db)
+    logger.info("Run backfill.py to build the listing_cards summaries for the merged listings")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ import bson
 from bs4 import BeautifulSoup
 from uuid import uuid4
 from helpers import translate_text, save_image, get_property_type, get_area_label, setup_logger, convert_to_usd, fetch_with_backoff
+from storage import LISTINGS_COLLECTION, insert_listing
+from derived import refresh_derived_collections
 from config import settings
 import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -24,7 +26,7 @@ def get_db_connection():
         password = urllib.parse.quote_plus(settings.DB_PASSWORD)
         thread_local.client = pymongo.MongoClient("mongodb://%s:%s@%s:%s" % (user, password, settings.DB_HOST, settings.DB_PORT))
         thread_local.db = thread_local.client.crawler_data
-        thread_local.collection = thread_local.db.nifty_collection
+        thread_local.collection = thread_local.db[LISTINGS_COLLECTION]
     return thread_local.collection
 
 # DB config (for backward compatibility)
@@ -32,7 +34,7 @@ user = urllib.parse.quote_plus(settings.DB_USER)
 password = urllib.parse.quote_plus(settings.DB_PASSWORD)
 client = pymongo.MongoClient("mongodb://%s:%s@%s:%s" % (user, password, settings.DB_HOST, settings.DB_PORT))
 db = client.crawler_data
-collection = db.nifty_collection
+collection = db[LISTINGS_COLLECTION]
 
 # Set up logger
 logger = setup_logger('nifty', 'nifty')
@@ -179,7 +181,7 @@ def scrape_page(prefecture, page_num):
 
         listing_data["images"] = image_paths
 
-        collection.insert_one(listing_data)
+        insert_listing(collection, listing_data, "nifty")
 
     return True
 
@@ -205,7 +207,7 @@ def process_prefecture(prefecture):
     logger.info(f"Completed processing prefecture: {prefecture} (processed {total_pages} pages)")
     return prefecture, total_pages
 
-def main():
+def crawl():
     prefectures = ["hokkaido", "aomori", "iwate", "miyagi", "akita", "yamagata", "fukushima", "tokyo", "kanagawa",
             "saitama", "chiba", "ibaraki", "tochigi", "gunma", "niigata", "yamanashi", "nagano", "toyama",
             "ishikawa", "fukui", "aichi", "gifu", "shizuoka", "mie", "osaka", "hyogo", "kyoto", "shiga",
@@ -255,5 +257,13 @@ def main():
         pages_per_second = total_pages / total_time
         logger.info(f"Performance: {pages_per_second:.2f} pages/second")
 
+
+def main():
+    try:
+        crawl()
+    finally:
+        # Publish whatever was inserted even if the crawl stopped partway
+        refresh_derived_collections(db)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
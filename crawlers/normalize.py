@@ -0,0 +1,155 @@
+import re
+import datetime
+from geocode import geocode_location
+
+# 1 tsubo = 400/121 square meters
+SQM_PER_TSUBO = 400 / 121
+
+# First year of each Japanese era, as it appears in translated dates ("Showa 55")
+ERA_START_YEARS = {
+    "meiji": 1868,
+    "taisho": 1912,
+    "showa": 1926,
+    "heisei": 1989,
+    "reiwa": 2019,
+}
+
+NUMBER_PATTERN = r"(\d+(?:\.\d+)?)"
+AREA_PATTERN = re.compile(NUMBER_PATTERN + r"\s*(m²|㎡|m2|sqm|square\s*met(?:er|re)s?|tsubo|坪)?", re.IGNORECASE)
+FOUR_DIGIT_YEAR_PATTERN = re.compile(r"(?<!\d)(\d{4})(?!\d)")
+ERA_YEAR_PATTERN = re.compile(r"(meiji|taisho|showa|heisei|reiwa)\s*(\d{1,2}|first)", re.IGNORECASE)
+YEARS_AGO_PATTERN = re.compile(r"(\d+)\s*years?", re.IGNORECASE)
+
+# Municipality suffixes in translated addresses. "-cho" is left out because it also
+# names neighborhoods within a city.
+MUNICIPALITY_KINDS = {
+    "city": "City", "shi": "City",
+    "ward": "Ward", "ku": "Ward",
+    "town": "Town", "machi": "Town",
+    "village": "Village", "mura": "Village",
+}
+# Romanized municipality names are single words, so only the word before the suffix
+# is taken ("Hokkaido Kitami-shi" is Kitami City)
+MUNICIPALITY_PATTERN = re.compile(
+    r"\b([^\W\d_](?:[^\W\d_]|')*)[ -](City|Ward|Town|Village|shi|ku|machi|mura)\b"
+)
+# Prefer the municipality itself over wards inside a city, and cities over towns
+MUNICIPALITY_PRIORITY = ["City", "Town", "Village", "Ward"]
+
+
+def extract_yen_amount(text):
+    if not text:
+        return None
+
+    # Remove commas for easier parsing
+    cleaned = text.lower().replace(',', '')
+    
+    match = re.search(r'([\d.]+)\s*(million|thousand)?\s*yen', cleaned)
+    if not match:
+        return None
+    
+    number = float(match.group(1))
+    unit = match.group(2)
+
+    if unit == 'million':
+        number *= 1_000_000
+    elif unit == 'thousand':
+        number *= 1_000
+
+    return int(number)
+
+
+def parse_area_sqm(text):
+    """
+    Parse an area string such as "105.99m²" or "32.06 tsubo" into square meters.
+
+    The first number in the string is used. Values given in tsubo are converted;
+    values without a unit are assumed to already be square meters.
+    """
+    if not text:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+
+    match = AREA_PATTERN.search(text.replace(',', ''))
+    if not match:
+        return None
+
+    value = float(match.group(1))
+    unit = (match.group(2) or "").lower()
+    if unit in ("tsubo", "坪"):
+        value *= SQM_PER_TSUBO
+
+    return round(value, 2)
+
+
+def parse_construction_year(text, current_year=None):
+    """
+    Parse a construction date string into a year.
+
+    Handles a 4-digit year ("March 1985"), a Japanese era year ("Showa 60")
+    and a building age ("12 years old").
+    """
+    if not text:
+        return None
+    if isinstance(text, int):
+        return text
+
+    if current_year is None:
+        current_year = datetime.datetime.now(datetime.timezone.utc).year
+
+    match = FOUR_DIGIT_YEAR_PATTERN.search(text)
+    if match:
+        return int(match.group(1))
+
+    match = ERA_YEAR_PATTERN.search(text)
+    if match:
+        era_year = match.group(2)
+        era_year = 1 if era_year.lower() == "first" else int(era_year)
+        return ERA_START_YEARS[match.group(1).lower()] + era_year - 1
+
+    match = YEARS_AGO_PATTERN.search(text)
+    if match:
+        return current_year - int(match.group(1))
+
+    return None
+
+
+def parse_municipality(text):
+    """
+    Extract the municipality from a translated address such as
+    "1-2 Tokoro, Kitami City, Hokkaido" and normalize it ("Kitami City").
+    Returns None when no city, town, village or ward name is found.
+    """
+    if not text:
+        return None
+
+    found = {}
+    for match in MUNICIPALITY_PATTERN.finditer(text):
+        kind = MUNICIPALITY_KINDS[match.group(2).lower()]
+        name = match.group(1).strip().title()
+        found.setdefault(kind, f"{name} {kind}")
+
+    for kind in MUNICIPALITY_PRIORITY:
+        if kind in found:
+            return found[kind]
+    return None
+
+
+def derive_listing_fields(listing_data, current_year=None):
+    """Compute the typed fields the listings API filters and sorts on"""
+    municipality = parse_municipality(listing_data.get("Property Location"))
+    return {
+        "price_yen": extract_yen_amount(listing_data.get("Sale Price Yen")),
+        "building_area_sqm": parse_area_sqm(listing_data.get("Building - Area")),
+        "land_area_sqm": parse_area_sqm(listing_data.get("Land - Area")),
+        "construction_year": parse_construction_year(listing_data.get("Building - Construction Date"), current_year),
+        "municipality": municipality,
+        **geocode_location(listing_data.get("Prefecture"), municipality),
+    }
+
+
+def add_derived_fields(listing_data):
+    """Add the typed filter/sort fields to a listing before it is inserted"""
+    listing_data.update(derive_listing_fields(listing_data))
+    return listing_data
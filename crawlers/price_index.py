@@ -0,0 +1,141 @@
+"""
+Daily and weekly price-index rollups per prefecture and property type.
+
+Listings are grouped by the day and the week they were first seen (createdAt).
+Each group records the listing count and the 25th/50th/75th percentile of
+price_yen and of yen per sqm. The results are stored as measurements in the
+price_index time-series collection, which the API reads for trend charts
+without touching listings.
+
+Each run recomputes the recent periods that may still be gaining listings and
+replaces their measurements, so it is safe to run repeatedly. Periods are never
+recomputed once they are out of the window. That way a listing that is later
+delisted still counts toward the day it appeared.
+
+Usage:
+    python price_index.py                 # recompute the last --days days (default 14)
+    python price_index.py --days 60
+    python price_index.py --rebuild       # recompute every period from the current listings
+"""
+import logging
+import datetime
+import argparse
+from pymongo import ASCENDING
+from helpers import setup_logger
+from storage import LISTINGS_COLLECTION, get_db
+from market_stats import ALL_PROPERTY_TYPES, PRICE_PER_SQM
+
+PRICE_INDEX_COLLECTION = "price_index"
+GRANULARITIES = ("day", "week")
+DEFAULT_DAYS = 14
+PERCENTILES = [0.25, 0.5, 0.75]
+
+logger = setup_logger('price_index', 'price_index')
+
+
+def ensure_price_index_collection(db):
+    """Create the time-series collection and its lookup index if they don't exist yet"""
+    if PRICE_INDEX_COLLECTION not in db.list_collection_names():
+        db.create_collection(
+            PRICE_INDEX_COLLECTION,
+            timeseries={"timeField": "period_start", "metaField": "meta", "granularity": "hours"},
+        )
+        logger.info(f"Created time-series collection {PRICE_INDEX_COLLECTION}")
+    db[PRICE_INDEX_COLLECTION].create_index(
+        [("meta.granularity", ASCENDING), ("meta.prefecture", ASCENDING),
+         ("meta.property_type", ASCENDING), ("period_start", ASCENDING)],
+        name="granularity_prefecture_property_type_period",
+    )
+
+
+def period_start(moment, granularity):
+    """Start of the day or week (weeks start on Monday, UTC) containing moment"""
+    start = datetime.datetime(moment.year, moment.month, moment.day, tzinfo=datetime.timezone.utc)
+    if granularity == "week":
+        start -= datetime.timedelta(days=start.weekday())
+    return start
+
+
+def rollup_pipeline(match, granularity, property_type):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "prefecture": "$Prefecture",
+                "property_type": property_type,
+                "period": {"$dateTrunc": {"date": "$createdAt", "unit": granularity,
+                                          "startOfWeek": "monday"}},
+            },
+            "count": {"$sum": 1},
+            "price_yen": {"$percentile": {"input": "$price_yen", "p": PERCENTILES, "method": "approximate"}},
+            "price_per_sqm_yen": {"$percentile": {"input": PRICE_PER_SQM, "p": PERCENTILES, "method": "approximate"}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "period_start": "$_id.period",
+            "meta": {
+                "granularity": granularity,
+                "prefecture": "$_id.prefecture",
+                "property_type": "$_id.property_type",
+            },
+            "count": 1,
+            "p25_price_yen": {"$arrayElemAt": ["$price_yen", 0]},
+            "median_price_yen": {"$arrayElemAt": ["$price_yen", 1]},
+            "p75_price_yen": {"$arrayElemAt": ["$price_yen", 2]},
+            "p25_price_per_sqm_yen": {"$arrayElemAt": ["$price_per_sqm_yen", 0]},
+            "median_price_per_sqm_yen": {"$arrayElemAt": ["$price_per_sqm_yen", 1]},
+            "p75_price_per_sqm_yen": {"$arrayElemAt": ["$price_per_sqm_yen", 2]},
+        }},
+    ]
+
+
+def refresh_price_index(db, since=None):
+    """
+    Recompute every day and week period starting at or after since (all periods if
+    None) and replace their measurements.
+    """
+    listings = db[LISTINGS_COLLECTION]
+    price_index = db[PRICE_INDEX_COLLECTION]
+
+    for granularity in GRANULARITIES:
+        match = {"Prefecture": {"$type": "string"}, "price_yen": {"$type": "number"},
+                 "createdAt": {"$type": "date"}}
+        replace = {"meta.granularity": granularity}
+        if since is not None:
+            # Widen to the start of the period so partial periods are recomputed whole
+            start = period_start(since, granularity)
+            match["createdAt"] = {"$gte": start}
+            replace["period_start"] = {"$gte": start}
+
+        measurements = list(listings.aggregate(rollup_pipeline(
+            match, granularity, {"$ifNull": ["$Property Type", "unknown"]})))
+        measurements += list(listings.aggregate(rollup_pipeline(match, granularity, ALL_PROPERTY_TYPES)))
+
+        removed = price_index.delete_many(replace).deleted_count
+        if measurements:
+            price_index.insert_many(measurements, ordered=False)
+        logger.info(f"Replaced {removed} {granularity} measurements with {len(measurements)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll listings up into the daily/weekly price index")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS,
+                        help="Recompute periods from this many days ago onwards")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recompute every period from the listings currently stored")
+    args = parser.parse_args()
+
+    logger.addHandler(logging.StreamHandler())
+    db = get_db()
+    ensure_price_index_collection(db)
+
+    since = None
+    if not args.rebuild:
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=args.days)
+    refresh_price_index(db, since)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import urllib.parse
+import pymongo
+from config import settings
+from normalize import add_derived_fields
+from locations import update_location_counts
+
+# All crawlers write into one collection; "source" records which site a listing came from
+LISTINGS_COLLECTION = "listings"
+
+# Compact copy of each listing holding only the typed filter/sort fields and what a
+# list card displays. The API pages through this collection and only reads full
+# listing documents for the page it returns.
+LISTING_CARDS_COLLECTION = "listing_cards"
+CARD_FIELDS = [
+    "source",
+    "Prefecture",
+    "Building - Layout",
+    "municipality",
+    "location",
+    "geo_precision",
+    "Sale Price",
+    "createdAt",
+    "price_yen",
+    "building_area_sqm",
+    "land_area_sqm",
+    "construction_year",
+]
+
+# Single document whose version is bumped whenever listings are added or removed,
+# so the API knows when its cached results are stale
+META_COLLECTION = "meta"
+DATA_VERSION_ID = "data_version"
+
+# Per-site collections used before listings were unified
+LEGACY_COLLECTIONS = {
+    "sumai": "sumai_collection",
+    "nifty": "nifty_collection",
+    "hatomark": "hatomark_collection",
+}
+
+
+# Prefectures that gained listings in this process, so derived collections can be
+# refreshed for just those prefectures when a crawl finishes
+changed_prefectures = set()
+
+# Listings inserted by this process since the data version was last bumped. The
+# version is bumped once when a crawl finishes rather than after every insert, so
+# the API's caches aren't invalidated continuously while a crawl runs.
+unpublished_inserts = 0
+
+
+def get_client():
+    user = urllib.parse.quote_plus(settings.DB_USER)
+    password = urllib.parse.quote_plus(settings.DB_PASSWORD)
+    return pymongo.MongoClient("mongodb://%s:%s@%s:%s" % (user, password, settings.DB_HOST, settings.DB_PORT))
+
+
+def get_db(client=None):
+    return (client or get_client()).crawler_data
+
+
+def bump_data_version(db):
+    """Invalidate the API's cached listing results"""
+    db[META_COLLECTION].update_one(
+        {"_id": DATA_VERSION_ID},
+        {"$inc": {"version": 1}, "$currentDate": {"updatedAt": True}},
+        upsert=True,
+    )
+
+
+def publish_inserts(db):
+    """Bump the data version if this process inserted listings since the last bump"""
+    global unpublished_inserts
+    if unpublished_inserts:
+        bump_data_version(db)
+        unpublished_inserts = 0
+
+
+def build_listing_card(listing):
+    """Build the listing_cards summary for a listing document"""
+    card = {field: listing[field] for field in CARD_FIELDS if field in listing}
+    card["_id"] = listing["_id"]
+    card["images"] = (listing.get("images") or [])[:1]
+    return card
+
+
+def insert_listing(collection, listing_data, source):
+    """Tag a scraped listing with its source, add the typed fields and insert it with its card"""
+    global unpublished_inserts
+    listing_data["source"] = source
+    add_derived_fields(listing_data)
+    collection.insert_one(listing_data)
+    if listing_data.get("Prefecture"):
+        changed_prefectures.add(listing_data["Prefecture"])
+    collection.database[LISTING_CARDS_COLLECTION].replace_one(
+        {"_id": listing_data["_id"]}, build_listing_card(listing_data), upsert=True
+    )
+    update_location_counts(collection.database, [listing_data], 1)
+    unpublished_inserts += 1
+    return listing_data
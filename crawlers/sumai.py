@@ -5,6 +5,8 @@ import bson
 from bs4 import BeautifulSoup
 from uuid import uuid4
 from helpers import translate_text, get_table_field_english, save_image, setup_logger, convert_to_usd, fetch_with_backoff
+from storage import LISTINGS_COLLECTION, insert_listing
+from derived import refresh_derived_collections
 from config import settings
 import datetime
 
@@ -21,7 +23,7 @@ user = urllib.parse.quote_plus(settings.DB_USER)
 password = urllib.parse.quote_plus(settings.DB_PASSWORD)
 client = pymongo.MongoClient("mongodb://%s:%s@%s:%s" % (user, password, settings.DB_HOST, settings.DB_PORT))
 db = client.crawler_data
-collection = db.sumai_collection
+collection = db[LISTINGS_COLLECTION]
 
 
 # --- SCRAPER FUNCTION ---
@@ -138,12 +140,12 @@ def scrape_page(page_num):
                 listing_data["Prefecture"] = loc_parts[-1].strip().lower()
 
         listing_data["createdAt"] = datetime.datetime.now(datetime.timezone.utc)
-        collection.insert_one(listing_data)
+        insert_listing(collection, listing_data, "sumai")
 
     return True
 
 # --- MAIN LOOP ---
-def main():
+def crawl():
     page = 1
     while True:
         logger.info(f"Scraping page {page}...")
@@ -156,5 +158,13 @@ def main():
 
     logger.info("Scraping complete.")
 
+
+def main():
+    try:
+        crawl()
+    finally:
+        # Publish whatever was inserted even if the crawl stopped partway
+        refresh_derived_collections(db)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -53,21 +53,19 @@ export default function Favorites() {
     
     setLoading(true);
     try {
-      const response = await realEstateAPI.getFavorites();
-      setFavorites(response.favorites);
+      // Favorites and their listings come back together in one request
+      const response = await realEstateAPI.getFavoritesWithListings();
+      setFavorites(response.favorites.map(favorite => favorite.listing_id));
       
-      // Fetch the actual listing data for each favorite
       const listingsData: RealEstateListing[] = [];
-      for (const favoriteId of response.favorites) {
-        try {
-          const backendListing = await realEstateAPI.getListingById(favoriteId);
-          const transformedListing = realEstateAPI.transformBackendListing(backendListing, 0);
-          // Use the original favoriteId instead of the transformed ID to ensure consistency
-          transformedListing.id = favoriteId;
-          listingsData.push(transformedListing);
-        } catch (err) {
-          console.error('Error fetching favorite listing:', err);
+      for (const favorite of response.favorites) {
+        if (!favorite.listing) {
+          continue;
         }
+        const transformedListing = realEstateAPI.transformBackendListing(favorite.listing, 0);
+        // Use the original favorite ID instead of the transformed ID to ensure consistency
+        transformedListing.id = favorite.listing_id;
+        listingsData.push(transformedListing);
       }
       
       setFavoriteListings(listingsData);
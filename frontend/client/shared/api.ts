@@ -109,6 +109,9 @@ export interface BackendListing {
   images?: string[];
   "Contact Number"?: string;
   "Reference URL"?: string;
+  municipality?: string;
+  location?: { type: 'Point'; coordinates: [number, number] }; // [longitude, latitude]
+  geo_precision?: 'municipality' | 'prefecture';
 }
 
 export interface BackendListingsResponse {
@@ -116,6 +119,32 @@ export interface BackendListingsResponse {
   total_count: number;
   total_pages: number;
   current_page: number;
+  // Pass as cursor to fetch the next page; null on the last page
+  next_cursor?: string | null;
+}
+
+export interface FacetCount {
+  value: string;
+  count: number;
+}
+
+export interface PriceBucketCount {
+  min: number;
+  max: number | null;
+  count: number;
+}
+
+export interface ListingFacetsResponse {
+  prefecture: FacetCount[];
+  layout: FacetCount[];
+  price: PriceBucketCount[];
+  total_count: number;
+}
+
+export interface LocationSuggestion {
+  municipality: string;
+  prefecture: string;
+  listing_count: number;
 }
 
 export interface BackendLayoutsResponse {
@@ -161,6 +190,16 @@ export interface GetFavorites {
   favorites: string[];
 }
 
+export interface FavoriteWithListing {
+  listing_id: string;
+  created_at: string;
+  listing: BackendListing | null; // null if the listing has been delisted
+}
+
+export interface GetFavoritesWithListings {
+  favorites: FavoriteWithListing[];
+}
+
 // API client functions
 export class RealEstateAPI {
   private baseUrl: string;
@@ -364,11 +403,17 @@ export class RealEstateAPI {
 
   // Existing listing methods
   async getListings(params: {
+    q?: string;
     prefecture?: string;
+    municipality?: string;
     layout?: string;
     sale_price_min?: number;
     sale_price_max?: number;
-    sort_by?: 'createdAt' | 'sale_price';
+    near?: string; // "latitude,longitude"
+    radius_km?: number;
+    bbox?: string; // "min_lon,min_lat,max_lon,max_lat"
+    include_approximate?: boolean;
+    sort_by?: 'createdAt' | 'sale_price' | 'relevance';
     sort_order?: 'asc' | 'desc';
     page?: number;
     limit?: number;
@@ -385,6 +430,41 @@ export class RealEstateAPI {
     return this.fetchAPI<BackendListingsResponse>(endpoint);
   }
 
+  // Prefecture, layout and price-bucket counts for the given filters, in one request
+  async getListingFacets(params: {
+    q?: string;
+    prefecture?: string;
+    municipality?: string;
+    layout?: string;
+    sale_price_min?: number;
+    sale_price_max?: number;
+    near?: string; // "latitude,longitude"
+    radius_km?: number;
+    bbox?: string; // "min_lon,min_lat,max_lon,max_lat"
+    include_approximate?: boolean;
+  } = {}): Promise<ListingFacetsResponse> {
+    const searchParams = new URLSearchParams();
+
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined && value !== null) {
+        searchParams.append(key, value.toString());
+      }
+    });
+
+    const endpoint = `/v1/listings/listings/facets?${searchParams.toString()}`;
+    return this.fetchAPI<ListingFacetsResponse>(endpoint);
+  }
+
+  // Municipalities starting with the typed text, most listings first
+  async autocompleteLocations(q: string, prefecture?: string, limit?: number): Promise<LocationSuggestion[]> {
+    const searchParams = new URLSearchParams({ q });
+    if (prefecture) searchParams.append('prefecture', prefecture);
+    if (limit) searchParams.append('limit', limit.toString());
+
+    const endpoint = `/v1/listings/listings/locations/autocomplete?${searchParams.toString()}`;
+    return this.fetchAPI<LocationSuggestion[]>(endpoint);
+  }
+
   // Helper function to transform backend data to frontend format
   transformBackendListing(backendListing: BackendListing, index: number): RealEstateListing {
     // Use the actual UUID from the database
@@ -473,6 +553,10 @@ export class RealEstateAPI {
     return this.fetchAPI<GetFavorites>('/v1/favorites/favorites');
   }
 
+  async getFavoritesWithListings(): Promise<GetFavoritesWithListings> {
+    return this.fetchAPI<GetFavoritesWithListings>('/v1/favorites/favorites/listings');
+  }
+
   async getListingById(listingId: string): Promise<BackendListing> {
     return this.fetchAPI<BackendListing>(`/v1/listings/listings/${listingId}`);
   }